@@ -1,12 +1,24 @@
-from flask import Flask, jsonify, request
-from src.info import process_bill_url
-from src.dub import dub
+import json
+import os
+from flask import Flask, Response, jsonify, request
+from src.info import (INFO_BATCH_MAX_URLS, get_audio_status, kv_cache, process_bill_url, process_bill_urls,
+                      stream_bill_url)
+from src.dub import dub_async
+from src.jobs import JobQueue, QueueFull
+from src import limits, metrics
 from urllib.parse import unquote
 from flask_cors import CORS
 
 app = Flask(__name__)
 CORS(app)
 
+# Longest /audio/<uid>?wait=<seconds> long-poll, in seconds.
+AUDIO_MAX_WAIT = float(os.getenv("AUDIO_MAX_WAIT", "30"))
+
+dub_jobs = JobQueue(max_workers=int(os.getenv("DUB_WORKERS", "4")),
+                    max_pending=int(os.getenv("DUB_MAX_PENDING", "64")),
+                    name="dub")
+
 @app.route('/info/<path:url>', methods=['GET'])
 def info(url):
 
@@ -15,12 +27,69 @@ def info(url):
 
     print(decoded_url)
 
-    result = process_bill_url(decoded_url)
+    with metrics.collect() as timings, metrics.timed("info.request"):
+        result = process_bill_url(decoded_url)
 
+    headers = {'Server-Timing': metrics.server_timing(timings)}
     if 'error' in result:
-        return jsonify(result), 500
+        return jsonify(result), 500, headers
     else:
-        return jsonify(result)
+        return jsonify(result), 200, headers
+
+@app.route('/info/stream/<path:url>', methods=['GET'])
+def info_stream(url):
+    decoded_url = unquote(url)
+
+    # Server-Sent Events: metadata, summary and audio as their stages finish,
+    # then a "result" event carrying the same JSON as /info.
+    def generate():
+        for event, data in stream_bill_url(decoded_url):
+            if event == 'keepalive':
+                yield ': keepalive\n\n'
+            else:
+                yield f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/info/batch', methods=['POST'])
+def info_batch():
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls')
+    if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+        return jsonify({'error': 'Expected a JSON body with a list of URLs in "urls"'}), 400
+    if len(urls) > INFO_BATCH_MAX_URLS:
+        return jsonify({'error': f'At most {INFO_BATCH_MAX_URLS} URLs per batch'}), 400
+
+    # One NDJSON line per bill, written as soon as that bill is ready.
+    def generate():
+        for url, result in process_bill_urls(urls):
+            yield json.dumps({'url': url, 'result': result}) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/audio/<uid>', methods=['GET'])
+def audio_status(uid):
+    wait = request.args.get('wait', 0, type=float)
+    if not wait >= 0:
+        return jsonify({'error': 'wait must be a non-negative number of seconds'}), 400
+    wait = min(wait, AUDIO_MAX_WAIT)
+    status = get_audio_status(uid, wait)
+    if status is None:
+        return jsonify({'error': 'Unknown bill id'}), 404
+    return jsonify(status)
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(kv_cache.stats())
+
+@app.route('/limits/stats', methods=['GET'])
+def limits_stats():
+    return jsonify(limits.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/dub', methods=['POST'])
 def dub_endpoint():
@@ -30,13 +99,29 @@ def dub_endpoint():
         name = data['name']
         target_lang = data['target_lang']
 
-        dub(file_url,name,target_lang)
+        job = dub_jobs.submit((name, target_lang), dub_async, file_url, name, target_lang)
 
-        return jsonify({'status': 'ok'})
+        return jsonify({'status': job['status'], 'job_id': job['id']}), 202
 
+    except QueueFull as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/dub/<job_id>', methods=['GET'])
+def dub_status(job_id):
+    job = dub_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job id'}), 404
+
+    return jsonify({
+        'job_id': job['id'],
+        'status': job['status'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'finished_at': job['finished_at'],
+    })
+
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,294 @@
+"""End-to-end benchmark of /info and /dub against local fakes of every upstream.
+
+Starts the fakes in bench/fakes.py, runs app.py in a subprocess pointed at
+them and drives cold, warm, mixed and dub workloads at each concurrency
+level. Reports p50/p95/p99 latency, requests per second and the app's peak
+RSS, and compares against a recorded baseline.
+
+    python -m bench.e2e_bench --workloads cold,warm,mixed --concurrency 1,8 --requests 40
+    python -m bench.e2e_bench --output baseline.json
+    python -m bench.e2e_bench --baseline baseline.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from bench import fakes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_COMMAND = ("from app import app; "
+               "app.run(host='127.0.0.1', port=int(__import__('sys').argv[1]), threaded=True)")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bill_url(n, run_id):
+    return f"https://api.govinfo.gov/packages/BILLS-118hr{run_id}{n}ih/summary"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def peak_rss_mb(pid):
+    """Returns the peak resident set size of a running process in MiB (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class App:
+    """app.py running in a subprocess against the fakes."""
+
+    def __init__(self, environment, port):
+        self.port = port
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", APP_COMMAND, str(port)], cwd=ROOT,
+            env=dict(os.environ, **environment),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        self._local = threading.local()
+
+    def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"app exited with status {self.process.returncode}")
+            try:
+                if self.request("GET", "/metrics")[0] == 200:
+                    return
+            except OSError:
+                self._local.conn = None
+            time.sleep(0.2)
+        raise RuntimeError("app did not start in time")
+
+    def request(self, method, path, body=None):
+        """Sends a request on this thread's keep-alive connection and returns (status, body)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=600)
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def stop(self):
+        peak = peak_rss_mb(self.process.pid)
+        self.process.terminate()
+        self.process.wait()
+        if peak is None:
+            # ru_maxrss of waited-for children, in KiB on Linux and bytes on macOS.
+            maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            peak = maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        return peak
+
+
+def info(app, url):
+    return app.request("GET", f"/info/{quote(url, safe='')}")
+
+
+def dub(app, name, poll_interval=0.05):
+    """Submits a dub and waits for its job to finish; returns (status, body) of the final poll."""
+    status, body = app.request("POST", "/dub", {
+        "file_url": f"https://example.com/{name}.mp4", "name": name, "target_lang": "es"})
+    if status != 202:
+        return status, body
+    job_id = json.loads(body)["job_id"]
+    while True:
+        status, body = app.request("GET", f"/dub/{job_id}")
+        if status != 200 or json.loads(body)["status"] in ("done", "failed"):
+            ok = status == 200 and json.loads(body)["status"] == "done"
+            return (200 if ok else 500), body
+        time.sleep(poll_interval)
+
+
+def workload_requests(workload, count, counter, warm_urls, warm_ratio, run_id, rng):
+    """Returns the request callables of one workload run."""
+    def cold():
+        url = bill_url(next(counter), run_id)
+        return lambda app: info(app, url)
+
+    def warm():
+        url = rng.choice(warm_urls)
+        return lambda app: info(app, url)
+
+    if workload == "cold":
+        return [cold() for _ in range(count)]
+    if workload == "warm":
+        return [warm() for _ in range(count)]
+    if workload == "mixed":
+        return [warm() if rng.random() < warm_ratio else cold() for _ in range(count)]
+    if workload == "dub":
+        return [(lambda name: lambda app: dub(app, name))(f"bench{run_id}_{next(counter)}") for _ in range(count)]
+    raise ValueError(f"unknown workload {workload}")
+
+
+def run_level(app, calls, concurrency):
+    """Runs the calls on `concurrency` client threads and returns latency statistics."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def run(call):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            status, _ = call(app)
+        except (http.client.HTTPException, OSError):
+            status = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run, calls))
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": len(calls),
+        "errors": errors,
+        "rps": len(calls) / wall if wall else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "peak_rss_mb": peak_rss_mb(app.process.pid),
+    }
+
+
+def compare(results, baseline):
+    """Prints the change of every metric against a baseline run."""
+    for key, result in results.items():
+        before = baseline.get(key)
+        if not before:
+            continue
+        changes = []
+        for metric in ("p50", "p95", "p99", "rps", "peak_rss_mb"):
+            if result.get(metric) and before.get(metric):
+                changes.append(f"{metric} {100 * (result[metric] / before[metric] - 1):+.1f}%")
+        print(f"{key:>16}  vs baseline: {', '.join(changes)}")
+
+
+def format_seconds(value):
+    return "-" if value is None else f"{value * 1000:8.1f}ms"
+
+
+def parse_latency(values):
+    """Parses name=seconds overrides of the fake latencies."""
+    latency = {}
+    for value in values:
+        name, _, seconds = value.partition("=")
+        if name not in fakes.DEFAULT_LATENCY:
+            raise argparse.ArgumentTypeError(f"unknown upstream {name}; one of {', '.join(fakes.DEFAULT_LATENCY)}")
+        latency[name] = float(seconds)
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workloads", default="cold,warm,mixed", help="comma-separated: cold, warm, mixed, dub")
+    parser.add_argument("--concurrency", default="1,8", help="comma-separated client concurrency levels")
+    parser.add_argument("--requests", type=int, default=40, help="requests per workload and level")
+    parser.add_argument("--warm-set", type=int, default=20, help="bills generated up front for warm requests")
+    parser.add_argument("--warm-ratio", type=float, default=0.8, help="share of warm requests in the mixed workload")
+    parser.add_argument("--latency", action="append", default=[], metavar="UPSTREAM=SECONDS",
+                        help=f"fake latency override, upstreams: {', '.join(fakes.DEFAULT_LATENCY)}")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies every fake latency")
+    parser.add_argument("--text-chars", type=int, default=60000, help="size of the fake bill text")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake LLM seconds per output token")
+    parser.add_argument("--dub-seconds", type=float, default=5.0, help="fake dubbing processing time")
+    parser.add_argument("--dub-audio-seconds", type=float, default=120.0, help="length of the fake dubbed audio")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra environment for the app, e.g. INFO_EXECUTION_MODE=serial")
+    parser.add_argument("--output", help="write the results as JSON, e.g. to record a baseline")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    latency = {name: seconds * args.scale
+               for name, seconds in dict(fakes.DEFAULT_LATENCY, **parse_latency(args.latency)).items()}
+    upstreams = fakes.start_all(latency, text_chars=args.text_chars, dub_seconds=args.dub_seconds,
+                                dub_audio_seconds=args.dub_audio_seconds, token_latency=args.token_latency)
+    environment = dict(fakes.app_environment(upstreams),
+                       DUB_POLL_MIN_INTERVAL=str(min(0.5, args.dub_seconds / 4)),
+                       **dict(value.split("=", 1) for value in args.env))
+
+    app = App(environment, free_port())
+    results = {}
+    try:
+        app.wait_ready()
+
+        rng = random.Random(args.seed)
+        run_id = int(time.time()) % 100000
+        counter = itertools.count()
+        workloads = args.workloads.split(",")
+
+        warm_urls = [bill_url(next(counter), run_id) for _ in range(args.warm_set)]
+        if {"warm", "mixed"} & set(workloads):
+            print(f"Generating {len(warm_urls)} bills for the warm set...")
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(lambda url: info(app, url), warm_urls))
+
+        print(f"{'workload':>16} {'requests':>8} {'errors':>6} {'rps':>8} "
+              f"{'p50':>10} {'p95':>10} {'p99':>10} {'peak rss':>9}")
+        for workload in workloads:
+            for concurrency in map(int, args.concurrency.split(",")):
+                calls = workload_requests(workload, args.requests, counter, warm_urls, args.warm_ratio, run_id, rng)
+                result = run_level(app, calls, concurrency)
+                key = f"{workload}@{concurrency}"
+                results[key] = result
+                rss = "-" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f}MiB"
+                print(f"{key:>16} {result['requests']:>8} {result['errors']:>6} {result['rps']:>8.2f} "
+                      f"{format_seconds(result['p50']):>10} {format_seconds(result['p95']):>10} "
+                      f"{format_seconds(result['p99']):>10} {rss:>9}")
+    finally:
+        peak = app.stop()
+        for upstream in upstreams.values():
+            upstream.stop()
+
+    print(f"app peak RSS: {peak:.0f}MiB")
+    print("upstream requests: " + ", ".join(f"{name}={server.requests}" for name, server in upstreams.items()))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f)["results"])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "peak_rss_mb": peak, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
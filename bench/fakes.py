@@ -0,0 +1,384 @@
+"""Local stand-ins for every upstream the app calls, for offline benchmarks.
+
+Each fake is a threaded HTTP server on 127.0.0.1 that answers with the shape
+the app expects after a configurable latency. Payload sizes are configurable
+so cold-path costs that scale with content (HTML cleanup, SRT building, R2
+uploads) stay realistic.
+"""
+import base64
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# One second of 128 kbps, 44.1 kHz MPEG-1 Layer III audio is 38.28 frames of 417 bytes.
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x00]) + bytes(413)
+MP3_FRAME_SECONDS = 1152 / 44100
+
+DEFAULT_LATENCY = {
+    "govinfo.summary": 0.15,
+    "govinfo.htm": 0.3,
+    "gemini": 2.0,
+    "chat": 3.0,
+    "tts": 4.0,
+    "dub.start": 0.3,
+    "dub.status": 0.05,
+    "dub.transcript": 0.1,
+    "dub.audio": 0.5,
+    "kv": 0.03,
+    "s3": 0.05,
+}
+
+
+def mp3_bytes(seconds):
+    """Returns silent MP3 frames lasting about `seconds`."""
+    return MP3_FRAME * max(1, round(seconds / MP3_FRAME_SECONDS))
+
+
+def words(count, seed=""):
+    """Returns filler prose of about `count` characters that differs per seed."""
+    sentence = f"The {seed} act amends section {len(seed)} of title 42 to fund programs. "
+    return (sentence * (count // len(sentence) + 1))[:count]
+
+
+class FakeServer:
+    """A threaded HTTP server dispatching (method, path regex) routes to handler functions.
+
+    A handler receives (request, match, body) and returns (status, headers, body).
+    Every response is delayed by the latency configured for its route name.
+    """
+
+    def __init__(self, name, latency=None):
+        self.name = name
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.routes = []
+        self.requests = 0
+        self.tokens = {"prompt": 0, "completion": 0}
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._dispatch(self)
+
+            do_POST = do_PUT = do_DELETE = do_HEAD = do_GET
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def count_tokens(self, prompt, completion):
+        with self._lock:
+            self.tokens["prompt"] += prompt
+            self.tokens["completion"] += completion
+
+    def route(self, method, pattern, name, handler):
+        self.routes.append((method, re.compile(pattern), name, handler))
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name=f"fake-{self.name}", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _dispatch(self, request):
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        path = urlsplit(request.path).path
+
+        with self._lock:
+            self.requests += 1
+
+        for method, pattern, name, handler in self.routes:
+            if method == request.command and (match := pattern.fullmatch(path)):
+                time.sleep(self.latency.get(name, 0.0))
+                status, headers, payload = handler(request, match, body)
+                break
+        else:
+            status, headers, payload = 404, {}, b"not found"
+
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload).encode("utf-8")
+            headers = dict({"Content-Type": "application/json"}, **headers)
+        elif isinstance(payload, str):
+            payload = payload.encode("utf-8")
+
+        request.send_response(status)
+        for key, value in headers.items():
+            request.send_header(key, value)
+        if "Content-Length" not in headers:
+            request.send_header("Content-Length", str(len(payload)))
+        request.end_headers()
+        if request.command != "HEAD":
+            request.wfile.write(payload)
+
+
+def govinfo(latency=None, text_chars=60000):
+    """govinfo package summary and HTML rendition."""
+    server = FakeServer("govinfo", latency)
+
+    def summary(request, match, body):
+        package_id = match.group(1)
+        return 200, {}, {
+            "packageId": package_id,
+            "dateIssued": "2024-01-03",
+            "originChamber": "HOUSE",
+            "currentChamber": "HOUSE",
+            "session": "2",
+            "branch": "legislative",
+            "documentType": "Public Law",
+            "members": [{"memberName": "Doe, Jane", "state": "CA", "party": "D", "bioGuideId": "D000001"}],
+        }
+
+    def htm(request, match, body):
+        return 200, {"Content-Type": "text/html"}, f"<html><body><pre>{words(text_chars, match.group(1))}</pre></body></html>"
+
+    server.route("GET", r"/packages/([^/]+)/summary", "govinfo.summary", summary)
+    server.route("GET", r"/packages/([^/]+)/htm", "govinfo.htm", htm)
+    return server
+
+
+def bullets(count, seed=""):
+    """Returns a markdown bullet list of about `count` characters."""
+    return "\n".join(f"- {words(count // 6, f'{seed}{i}')}" for i in range(6))
+
+
+def gemini(latency=None, summary_chars=1500, narrative_chars=1800, token_latency=0.0):
+    """Gemini generateContent over REST; JSON-mode requests get a fused summary and narrative.
+
+    Each response is further delayed by `token_latency` seconds per output token.
+    """
+    server = FakeServer("gemini", latency)
+
+    def generate(request, match, body):
+        prompt = json.loads(body or b"{}")
+        chars = sum(len(part.get("text", "")) for content in prompt.get("contents", [])
+                    for part in content.get("parts", []))
+        chars += sum(len(part.get("text", "")) for part in prompt.get("systemInstruction", {}).get("parts", []))
+        if prompt.get("generationConfig", {}).get("responseMimeType") == "application/json":
+            text = json.dumps({"summary": bullets(summary_chars, str(chars)),
+                               "narrative": words(narrative_chars, str(chars))})
+        else:
+            text = bullets(summary_chars, str(chars))
+        server.count_tokens(chars // 4, len(text) // 4)
+        time.sleep(len(text) // 4 * token_latency)
+        return 200, {}, {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": 1,
+                "index": 0,
+            }],
+            "usageMetadata": {"promptTokenCount": chars // 4, "candidatesTokenCount": len(text) // 4,
+                              "totalTokenCount": (chars + len(text)) // 4},
+        }
+
+    server.route("POST", r"/v1beta/models/([^/:]+):generateContent", "gemini", generate)
+    return server
+
+
+def chat(latency=None, narrative_chars=1800, token_latency=0.0):
+    """OpenAI-compatible chat completions (SambaNova), delayed `token_latency` seconds per output token."""
+    server = FakeServer("chat", latency)
+
+    def completions(request, match, body):
+        messages = json.loads(body or b"{}").get("messages", [])
+        prompt_chars = sum(len(message.get("content", "")) for message in messages)
+        server.count_tokens(prompt_chars // 4, narrative_chars // 4)
+        time.sleep(narrative_chars // 4 * token_latency)
+        return 200, {}, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": json.loads(body or b"{}").get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": words(narrative_chars, str(prompt_chars))},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": narrative_chars // 4,
+                      "total_tokens": (prompt_chars + narrative_chars) // 4},
+        }
+
+    server.route("POST", r"/v1/chat/completions", "chat", completions)
+    return server
+
+
+def elevenlabs(latency=None, chars_per_second=15.0, dub_seconds=5.0, dub_audio_seconds=120.0):
+    """ElevenLabs text-to-speech with timestamps and the dubbing API."""
+    server = FakeServer("elevenlabs", latency)
+    dubs = {}
+
+    def tts(request, match, body):
+        text = json.loads(body or b"{}").get("text", "")
+        audio = mp3_bytes(len(text) / chars_per_second)
+        step = (len(audio) // len(MP3_FRAME) * MP3_FRAME_SECONDS) / max(1, len(text))
+        return 200, {}, {
+            "audio_base64": base64.b64encode(audio).decode("ascii"),
+            "alignment": {
+                "characters": list(text),
+                "character_start_times_seconds": [i * step for i in range(len(text))],
+                "character_end_times_seconds": [(i + 1) * step for i in range(len(text))],
+            },
+        }
+
+    def start(request, match, body):
+        dubbing_id = uuid.uuid4().hex
+        dubs[dubbing_id] = time.monotonic() + dub_seconds
+        return 200, {}, {"dubbing_id": dubbing_id, "expected_duration_sec": dub_seconds}
+
+    def status(request, match, body):
+        ready_at = dubs.get(match.group(1))
+        if ready_at is None:
+            return 404, {}, {"detail": "dubbing not found"}
+        return 200, {}, {"dubbing_id": match.group(1),
+                         "status": "dubbed" if time.monotonic() >= ready_at else "dubbing"}
+
+    def transcript(request, match, body):
+        return 200, {"Content-Type": "text/plain"}, "1\n00:00:00,000 --> 00:00:02,000\nHello.\n\n"
+
+    def audio(request, match, body):
+        return 200, {"Content-Type": "audio/mpeg"}, mp3_bytes(dub_audio_seconds)
+
+    server.route("POST", r"/v1/text-to-speech/([^/]+)/with-timestamps", "tts", tts)
+    server.route("POST", r"/v1/dubbing", "dub.start", start)
+    server.route("GET", r"/v1/dubbing/([^/]+)", "dub.status", status)
+    server.route("GET", r"/v1/dubbing/([^/]+)/transcript/([^/]+)", "dub.transcript", transcript)
+    server.route("GET", r"/v1/dubbing/([^/]+)/audio/([^/]+)", "dub.audio", audio)
+    return server
+
+
+def kv(latency=None):
+    """Cloudflare Workers KV: single values and bulk reads, kept in memory."""
+    server = FakeServer("kv", latency)
+    store = {}
+    namespace = r"/client/v4/accounts/[^/]+/storage/kv/namespaces/[^/]+"
+
+    def get(request, match, body):
+        key = unquote(match.group(1))
+        if key not in store:
+            return 404, {}, {"success": False, "errors": [{"code": 10009, "message": "key not found"}]}
+        return 200, {"Content-Type": "application/octet-stream"}, store[key]
+
+    def put(request, match, body):
+        store[unquote(match.group(1))] = body
+        return 200, {}, {"success": True, "errors": [], "result": None}
+
+    def bulk_get(request, match, body):
+        keys = json.loads(body).get("keys", [])
+        values = {key: json.loads(store[key]) if key in store else None for key in keys}
+        return 200, {}, {"success": True, "errors": [], "result": {"values": values}}
+
+    server.route("GET", namespace + r"/values/(.+)", "kv", get)
+    server.route("PUT", namespace + r"/values/(.+)", "kv", put)
+    server.route("POST", namespace + r"/bulk/get", "kv", bulk_get)
+    server.store = store
+    return server
+
+
+def s3(latency=None):
+    """S3-compatible object store (path-style) with multipart uploads, kept in memory."""
+    server = FakeServer("s3", latency)
+    objects = {}
+    uploads = {}
+
+    def xml(root, **fields):
+        inner = "".join(f"<{key}>{value}</{key}>" for key, value in fields.items())
+        return f'<?xml version="1.0" encoding="UTF-8"?><{root}>{inner}</{root}>'
+
+    def no_such_key(request):
+        if request.command == "HEAD":
+            return 404, {}, b""
+        return 404, {"Content-Type": "application/xml"}, xml("Error", Code="NoSuchKey", Message="The specified key does not exist.")
+
+    def put(request, match, body):
+        query = parse_qs(urlsplit(request.path).query)
+        etag = f'"{uuid.uuid4().hex}"'
+        if "uploadId" in query:
+            uploads[query["uploadId"][0]][int(query["partNumber"][0])] = body
+        else:
+            objects[match.group(1)] = body
+        return 200, {"ETag": etag}, b""
+
+    def get(request, match, body):
+        if match.group(1) not in objects:
+            return no_such_key(request)
+        return 200, {"Content-Type": "application/octet-stream", "ETag": '"0"'}, objects[match.group(1)]
+
+    def head(request, match, body):
+        if match.group(1) not in objects:
+            return no_such_key(request)
+        return 200, {"Content-Length": str(len(objects[match.group(1)])), "ETag": '"0"'}, b""
+
+    def post(request, match, body):
+        query = parse_qs(urlsplit(request.path).query, keep_blank_values=True)
+        bucket, key = match.group(1).split("/", 1)
+        if "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            uploads[upload_id] = {}
+            return 200, {"Content-Type": "application/xml"}, xml(
+                "InitiateMultipartUploadResult", Bucket=bucket, Key=key, UploadId=upload_id)
+        parts = uploads.pop(query["uploadId"][0])
+        objects[match.group(1)] = b"".join(parts[number] for number in sorted(parts))
+        return 200, {"Content-Type": "application/xml"}, xml(
+            "CompleteMultipartUploadResult", Location=f"{server.url}/{match.group(1)}", Bucket=bucket, Key=key, ETag='"0"')
+
+    def delete(request, match, body):
+        query = parse_qs(urlsplit(request.path).query)
+        if "uploadId" in query:
+            uploads.pop(query["uploadId"][0], None)
+        else:
+            objects.pop(match.group(1), None)
+        return 204, {}, b""
+
+    for method, handler in (("PUT", put), ("GET", get), ("HEAD", head), ("POST", post), ("DELETE", delete)):
+        server.route(method, r"/([^/]+/.+)", "s3", handler)
+    server.objects = objects
+    server.uploads = uploads
+    return server
+
+
+def start_all(latency=None, text_chars=60000, summary_chars=1500, narrative_chars=1800,
+              dub_seconds=5.0, dub_audio_seconds=120.0, token_latency=0.0):
+    """Starts every fake and returns them keyed by upstream."""
+    return {
+        "govinfo": govinfo(latency, text_chars).start(),
+        "gemini": gemini(latency, summary_chars, narrative_chars, token_latency).start(),
+        "chat": chat(latency, narrative_chars, token_latency).start(),
+        "elevenlabs": elevenlabs(latency, dub_seconds=dub_seconds, dub_audio_seconds=dub_audio_seconds).start(),
+        "kv": kv(latency).start(),
+        "s3": s3(latency).start(),
+    }
+
+
+def app_environment(fakes):
+    """Environment variables that point the app at the fakes."""
+    return {
+        "GOVINFO_BASE_URL": fakes["govinfo"].url,
+        "GOVINFO_API_KEY": "bench",
+        "GEMINI_API_ENDPOINT": fakes["gemini"].url,
+        "GEMINI_API_KEY": "bench",
+        "SAMBANOVA_BASE_URL": f"{fakes['chat'].url}/v1",
+        "CEREBRAS_API_KEY": "bench",
+        "ELEVENLABS_API_URL": fakes["elevenlabs"].url,
+        "ELEVENLABS_API_KEY": "bench",
+        "CLOUDFLARE_API_URL": fakes["kv"].url,
+        "CLOUDFLARE_API_TOKEN": "bench",
+        "CLOUDFLARE_ACCOUNT_ID": "bench",
+        "CLOUDFLARE_KV_NAMESPACE_ID": "bench",
+        "R2_ENDPOINT": fakes["s3"].url,
+        "R2_ACCESS_KEY": "bench",
+        "R2_SECRET_KEY": "bench",
+        "R2_BUCKET_NAME": "bench",
+        "AWS_DEFAULT_REGION": "us-east-1",
+    }
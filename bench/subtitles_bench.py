@@ -0,0 +1,106 @@
+"""Micro-benchmark for subtitle segmentation on long narrations.
+
+Compares src/subtitles against the original string-concatenation loop from
+src/audio.py on synthetic alignments.
+
+    python -m bench.subtitles_bench --minutes 60
+"""
+import argparse
+import random
+import time
+
+from src import subtitles
+
+WORDS = ("the bill would require each agency to report on funding for programs "
+         "that support veterans, families, and small businesses across the country.").split()
+
+
+def synthetic_alignment(minutes, seed=0):
+    """Builds an ElevenLabs-style alignment of roughly `minutes` of narration."""
+    rng = random.Random(seed)
+    chars, starts, ends = [], [], []
+    t = 0.0
+    while t < minutes * 60:
+        for char in rng.choice(WORDS) + " ":
+            duration = rng.uniform(0.04, 0.09)
+            chars.append(char)
+            starts.append(t)
+            ends.append(t + duration)
+            t += duration
+    return {
+        "characters": chars,
+        "character_start_times_seconds": starts,
+        "character_end_times_seconds": ends,
+    }
+
+
+def legacy_srt(alignment):
+    """The original per-character loop, kept here as the baseline."""
+    def timestamp(milliseconds):
+        seconds, milliseconds = divmod(milliseconds, 1000)
+        minutes, seconds = divmod(seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours:02.0f}:{minutes:02.0f}:{seconds:02.0f},{milliseconds:03.0f}"
+
+    srt_subtitles = ""
+    subtitle_index = 1
+    current_subtitle = ""
+    start_time = None
+    last_end_time = 0
+
+    for i, (char, char_start_time, char_end_time) in enumerate(zip(
+            alignment['characters'],
+            alignment['character_start_times_seconds'],
+            alignment['character_end_times_seconds'])):
+
+        if not start_time:
+            start_time = char_start_time
+
+        current_subtitle += char
+
+        if i + 1 == len(alignment['characters']) or char.isspace() or char in ['.', ',', '!', '?']:
+            end_time = char_end_time
+            if end_time - last_end_time >= 1.5:
+                srt_subtitles += f"{subtitle_index}\n"
+                srt_subtitles += f"{timestamp(start_time * 1000)} --> {timestamp(end_time * 1000)}\n"
+                srt_subtitles += f"{current_subtitle.strip()}\n\n"
+                subtitle_index += 1
+                current_subtitle = ""
+                start_time = None
+                last_end_time = end_time
+            else:
+                current_subtitle += " "
+                start_time = None
+
+    return srt_subtitles
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[2, 15, 60])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'minutes':>8} {'chars':>9} {'cues':>6} {'legacy s':>9} {'segment s':>10} {'srt s':>7} {'vtt s':>7}")
+    for minutes in args.minutes:
+        alignment = synthetic_alignment(minutes)
+        cues = subtitles.segment(alignment)
+        legacy = best_of(lambda: legacy_srt(alignment), args.repeat)
+        segment = best_of(lambda: subtitles.segment(alignment), args.repeat)
+        srt = best_of(lambda: subtitles.to_srt(cues), args.repeat)
+        vtt = best_of(lambda: subtitles.to_vtt(cues), args.repeat)
+        print(f"{minutes:>8g} {len(alignment['characters']):>9} {len(cues):>6} "
+              f"{legacy:>9.3f} {segment:>10.3f} {srt:>7.3f} {vtt:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
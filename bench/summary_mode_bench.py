@@ -0,0 +1,74 @@
+"""Benchmark of the separate and fused summary/narration modes on cold /info requests.
+
+Runs app.py once per SUMMARY_MODE against the fakes in bench/fakes.py and
+compares cold-path latency and the LLM tokens spent per bill. Fake LLM
+latency is a fixed time to first token plus --token-latency per output token.
+
+    python -m bench.summary_mode_bench --requests 20 --concurrency 4
+"""
+import argparse
+import itertools
+import random
+import time
+
+from bench import fakes
+from bench.e2e_bench import App, format_seconds, free_port, run_level, workload_requests
+
+MODES = ("separate", "fused")
+
+
+def run_mode(mode, args):
+    """Runs the cold workload with one SUMMARY_MODE and returns its statistics."""
+    latency = {name: seconds * args.scale for name, seconds in fakes.DEFAULT_LATENCY.items()}
+    upstreams = fakes.start_all(latency, text_chars=args.text_chars, token_latency=args.token_latency)
+    app = App(dict(fakes.app_environment(upstreams), SUMMARY_MODE=mode), free_port())
+    try:
+        app.wait_ready()
+        calls = workload_requests("cold", args.requests, itertools.count(), [], 0.0,
+                                  f"{int(time.time()) % 100000}{mode[0]}", random.Random(args.seed))
+        result = run_level(app, calls, args.concurrency)
+    finally:
+        app.stop()
+        for upstream in upstreams.values():
+            upstream.stop()
+
+    llm_calls = upstreams["gemini"].requests + upstreams["chat"].requests
+    prompt = upstreams["gemini"].tokens["prompt"] + upstreams["chat"].tokens["prompt"]
+    completion = upstreams["gemini"].tokens["completion"] + upstreams["chat"].tokens["completion"]
+    result.update(
+        llm_calls_per_bill=llm_calls / args.requests,
+        prompt_tokens_per_bill=prompt / args.requests,
+        completion_tokens_per_bill=completion / args.requests,
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20, help="cold bills per mode")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--token-latency", type=float, default=0.004, help="fake LLM seconds per output token")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies every fake latency")
+    parser.add_argument("--text-chars", type=int, default=60000, help="size of the fake bill text")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = {mode: run_mode(mode, args) for mode in MODES}
+
+    print(f"{'mode':>9} {'errors':>6} {'rps':>7} {'p50':>10} {'p95':>10} {'p99':>10} "
+          f"{'llm calls':>9} {'tokens in':>9} {'tokens out':>10}")
+    for mode, result in results.items():
+        print(f"{mode:>9} {result['errors']:>6} {result['rps']:>7.2f} {format_seconds(result['p50']):>10} "
+              f"{format_seconds(result['p95']):>10} {format_seconds(result['p99']):>10} "
+              f"{result['llm_calls_per_bill']:>9.1f} {result['prompt_tokens_per_bill']:>9.0f} "
+              f"{result['completion_tokens_per_bill']:>10.0f}")
+
+    separate, fused = results["separate"], results["fused"]
+    if separate["p50"] and fused["p50"]:
+        print(f"fused p50 change: {100 * (fused['p50'] / separate['p50'] - 1):+.1f}%, "
+              f"tokens per bill: {fused['prompt_tokens_per_bill'] + fused['completion_tokens_per_bill']:.0f} vs "
+              f"{separate['prompt_tokens_per_bill'] + separate['completion_tokens_per_bill']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark for merging govinfo pages into the package catalog.
+
+Compares utils/merge (indexed merge) against the original nested-scan
+update_items on a synthetic catalog.
+
+    python -m bench.update_items_bench --catalog 100000 --pages 5
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from utils.merge import index_items, merge_changes, update_items
+
+START = datetime(2023, 1, 3)
+
+
+def package(n, minutes):
+    return {
+        "packageId": f"BILLS-118hr{n}ih",
+        "lastModified": (START + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "packageLink": f"https://api.govinfo.gov/packages/BILLS-118hr{n}ih/summary",
+        "docClass": "hr",
+        "title": f"Synthetic bill {n}",
+        "congress": "118",
+        "dateIssued": "2023-01-03",
+    }
+
+
+def synthetic_catalog(size):
+    return [package(n, size - n) for n in range(size)]
+
+
+def synthetic_pages(size, pages, page_size, update_ratio, seed=0):
+    """Pages of packages that are either new or newer versions of catalog entries."""
+    rng = random.Random(seed)
+    minutes = size + 1
+    result = []
+    for _ in range(pages):
+        page = []
+        for _ in range(page_size):
+            n = rng.randrange(size) if rng.random() < update_ratio else size + minutes
+            page.append(package(n, minutes))
+            minutes += 1
+        result.append(page)
+    return result
+
+
+def legacy_update_items(existing_items, new_items, key_field="packageId"):
+    """The original nested-scan merge, kept here as the baseline."""
+    updated = False
+    stop_early = False
+
+    for new_item in new_items:
+        found_match = False
+        for i, existing_item in enumerate(existing_items):
+            if new_item[key_field] == existing_item[key_field]:
+                if new_item["lastModified"] > existing_item["lastModified"]:
+                    existing_items[i] = new_item
+                    updated = True
+                found_match = True
+                break
+        if not found_match:
+            existing_items.insert(0, new_item)
+            updated = True
+        elif found_match and not updated:
+            stop_early = True
+            break
+
+    return updated, stop_early
+
+
+def run_legacy(catalog, pages):
+    items = list(catalog)
+    for page in pages:
+        legacy_update_items(items, page)
+    return sorted(items, key=lambda item: item['lastModified'], reverse=True)
+
+
+def run_indexed(catalog, pages):
+    index = index_items(catalog)
+    changes = {}
+    for page in pages:
+        update_items(index, changes, page)
+    return merge_changes(catalog, changes)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--catalog", type=int, default=100000)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--update-ratio", type=float, default=0.3)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    catalog = synthetic_catalog(args.catalog)
+    pages = synthetic_pages(args.catalog, args.pages, args.page_size, args.update_ratio)
+
+    # Silence the per-item progress prints while timing.
+    import builtins
+    builtins_print, builtins.print = builtins.print, lambda *a, **k: None
+    try:
+        indexed, indexed_time = timed(run_indexed, catalog, pages)
+        legacy, legacy_time = (None, None) if args.skip_legacy else timed(run_legacy, catalog, pages)
+    finally:
+        builtins.print = builtins_print
+
+    print(f"catalog={args.catalog} pages={args.pages} page_size={args.page_size}")
+    print(f"indexed merge: {indexed_time:.3f}s ({len(indexed)} packages)")
+    if legacy is not None:
+        print(f"legacy merge:  {legacy_time:.3f}s ({len(legacy)} packages)")
+        print(f"same result:   {[i['packageId'] for i in legacy] == [i['packageId'] for i in indexed]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,25 @@ import json
 import os
 from dotenv import load_dotenv
 import base64
+import re
+from concurrent.futures import ThreadPoolExecutor
 import openai
 import boto3
 
+from src import metrics, mp3, subtitles
+from src.limits import estimate_tokens, limiter
+
 load_dotenv()
 
 api_key = os.getenv("CEREBRAS_API_KEY")
 
 client = openai.OpenAI(
-    base_url="https://api.sambanova.ai/v1",
+    base_url=os.getenv("SAMBANOVA_BASE_URL", "https://api.sambanova.ai/v1"),
     api_key=api_key
 )
 
+ELEVENLABS_API_URL = os.getenv("ELEVENLABS_API_URL", "https://api.elevenlabs.io")
+
 s3 = boto3.client(
     's3',
     endpoint_url=os.getenv("R2_ENDPOINT"),
@@ -22,10 +29,17 @@ s3 = boto3.client(
     aws_secret_access_key=os.getenv("R2_SECRET_KEY"),
 )
 
-def generate_speech(content):
-    """Generates a narrative speech from the given content."""
+upload_pool = ThreadPoolExecutor(max_workers=int(os.getenv("R2_UPLOAD_WORKERS", "4")),
+                                 thread_name_prefix="r2-upload")
 
-    instructions = """
+# Narratives longer than TTS_CHUNK_CHARS are split at sentence boundaries and
+# synthesized in parallel, at most TTS_CONCURRENCY requests at a time. 0 disables it.
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "0"))
+
+tts_pool = ThreadPoolExecutor(max_workers=int(os.getenv("TTS_CONCURRENCY", "4")),
+                              thread_name_prefix="tts")
+
+NARRATION_INSTRUCTIONS = """
     Your task is to convert the given summary into a narrative speech optimized for audio generation. Specifically:
 
     1. Remove special characters, abbreviations, and any miscellaneous information that might cause mispronunciations.
@@ -34,26 +48,60 @@ def generate_speech(content):
     4. Keep the length suitable for generating an audio file that is approximately two minutes long.
     5. Return a clean, unformatted text ready for smooth audio narration.
     6. Do not include any greetings, pretext or notes at the beginning or end of the content, the provided response is directly used to generate the response.
-    """
-
-    completion = client.chat.completions.create(
-        model="Meta-Llama-3.1-405B-Instruct",
-        temperature=0.7,
-        stream=False,
-        messages=[
-            {"role": "system", "content": instructions},
-            {"role": "user", "content": content}
-        ],
-    )
+"""
+
+def generate_speech(content):
+    """Generates a narrative speech from the given content."""
+
+    with limiter("sambanova").limit(tokens=estimate_tokens(NARRATION_INSTRUCTIONS + content)), metrics.timed("sambanova"):
+        completion = client.chat.completions.create(
+            model="Meta-Llama-3.1-405B-Instruct",
+            temperature=0.7,
+            stream=False,
+            messages=[
+                {"role": "system", "content": NARRATION_INSTRUCTIONS},
+                {"role": "user", "content": content}
+            ],
+        )
 
     return completion.choices[0].message.content
 
-def generate_audio(text, uid):
-    """Generates audio and SRT subtitles, uploads to R2, and returns file names."""
+def synthesize_audio(text):
+    """Generates audio with ElevenLabs and returns the audio bytes and SRT subtitles."""
+
+    if TTS_CHUNK_CHARS and len(text) > TTS_CHUNK_CHARS:
+        chunks = split_sentences(text, TTS_CHUNK_CHARS)
+        responses = list(tts_pool.map(metrics.bind(
+            lambda i: request_speech(chunks[i],
+                                     previous_text=chunks[i - 1] if i > 0 else None,
+                                     next_text=chunks[i + 1] if i + 1 < len(chunks) else None)),
+            range(len(chunks))))
+    else:
+        responses = [request_speech(text)]
+
+    if any("audio_base64" not in response_dict for response_dict in responses):
+        print("Warning: 'audio_base64' not found in the API response")
+        return None, None
+
+    audio_parts = [base64.b64decode(response_dict["audio_base64"]) for response_dict in responses]
+    if len(audio_parts) == 1:
+        audio_bytes, alignment = audio_parts[0], responses[0]['alignment']
+    else:
+        audio_bytes = b"".join(audio_parts)
+        alignment = merge_alignments([response_dict['alignment'] for response_dict in responses],
+                                     [mp3.duration(part) for part in audio_parts])
+
+    with metrics.timed("srt"):
+        srt_subtitles = subtitles.to_srt(subtitles.segment(alignment))
+
+    return audio_bytes, srt_subtitles
+
+def request_speech(text, previous_text=None, next_text=None):
+    """Calls the ElevenLabs text-to-speech with-timestamps endpoint and returns the response."""
 
     voice_id = "XrExE9yKIg1WjnnlVkGX"
 
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/with-timestamps"
+    url = f"{ELEVENLABS_API_URL}/v1/text-to-speech/{voice_id}/with-timestamps"
 
     headers = {
         "Content-Type": "application/json",
@@ -68,88 +116,90 @@ def generate_audio(text, uid):
             "similarity_boost": 0.75
         }
     }
+    # Neighbouring text keeps the intonation continuous across chunk boundaries.
+    if previous_text:
+        data["previous_text"] = previous_text
+    if next_text:
+        data["next_text"] = next_text
 
-    response = requests.post(url, json=data, headers=headers)
+    # ElevenLabs bills by character, so the text length is charged as tokens.
+    with limiter("elevenlabs").limit(tokens=len(text)) as elevenlabs, metrics.timed("elevenlabs.tts"):
+        response = elevenlabs.observe(requests.post(url, json=data, headers=headers))
+    metrics.add_bytes("elevenlabs.tts", len(response.content))
 
     if response.status_code != 200:
+        metrics.add_error("elevenlabs.tts")
         raise Exception(
             f"Error encountered, status: {response.status_code}, content: {response.text}")
 
-    response_dict = json.loads(response.content.decode("utf-8"))
-
-    if "audio_base64" not in response_dict:
-        print("Warning: 'audio_base64' not found in the API response")
-        return None, None
-
-    audio_bytes = base64.b64decode(response_dict["audio_base64"])
-
-    srt_subtitles = ""
-    subtitle_index = 1
-    current_subtitle = ""
-    start_time = None
-    last_end_time = 0
-
-    for i, (char, char_start_time, char_end_time) in enumerate(zip(
-            response_dict['alignment']['characters'],
-            response_dict['alignment']['character_start_times_seconds'],
-            response_dict['alignment']['character_end_times_seconds'])):
-
-        if not start_time:
-            start_time = char_start_time
-    
-        current_subtitle += char
+    return json.loads(response.content.decode("utf-8"))
+
+def split_sentences(text, max_chars):
+    """Splits text at sentence boundaries into chunks of at most max_chars where possible."""
+
+    chunks = []
+    current = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", text.strip()):
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def merge_alignments(alignments, durations):
+    """Concatenates per-chunk alignments, shifting each by the audio played before it."""
+
+    characters, starts, ends = [], [], []
+    offset = 0.0
+    for alignment, duration in zip(alignments, durations):
+        if characters:
+            # Separate the last word of one chunk from the first word of the next.
+            characters.append(" ")
+            starts.append(offset)
+            ends.append(offset)
+        characters.extend(alignment['characters'])
+        starts.extend(t + offset for t in alignment['character_start_times_seconds'])
+        ends.extend(t + offset for t in alignment['character_end_times_seconds'])
+        offset += duration or alignment['character_end_times_seconds'][-1]
+
+    return {
+        'characters': characters,
+        'character_start_times_seconds': starts,
+        'character_end_times_seconds': ends,
+    }
 
-        if i + 1 == len(response_dict['alignment']['characters']) or char.isspace() or char in ['.', ',', '!', '?']:
-            end_time = char_end_time
+def audio_keys(uid):
+    """Returns the R2 keys of the English audio and SRT files for a bill."""
+    return f"{uid}_en.mp3", f"{uid}_en.srt"
 
-            if end_time - last_end_time >= 1.5:  
+def put_object(bucket, key, body):
+    """Puts one object in R2, recording its latency and size."""
+    with metrics.timed("r2.put"):
+        s3.put_object(Bucket=bucket, Key=key, Body=body)
+    metrics.add_bytes("r2.put", len(body))
 
-                start_time_srt = milliseconds_to_srt_timestamp(start_time * 1000)
-                end_time_srt = milliseconds_to_srt_timestamp(end_time * 1000)
+def upload_audio(audio_bytes, srt_subtitles, uid):
+    """Uploads the audio and SRT files to R2 in parallel and returns their keys."""
 
-                srt_subtitles += f"{subtitle_index}\n"
-                srt_subtitles += f"{start_time_srt} --> {end_time_srt}\n"
-                srt_subtitles += f"{current_subtitle.strip()}\n\n"
+    audio_key, srt_key = audio_keys(uid)
+    bucket = os.environ.get("R2_BUCKET_NAME")
 
-                subtitle_index += 1
-                current_subtitle = ""
-                start_time = None
-                last_end_time = end_time
-            else:
-                current_subtitle += " "
-                start_time = None
+    audio_upload = upload_pool.submit(metrics.bind(put_object), bucket, audio_key, audio_bytes)
+    srt_upload = upload_pool.submit(metrics.bind(put_object), bucket, srt_key, srt_subtitles)
 
-    audio_key = f"{uid}_en.mp3"
     try:
-        s3.put_object(Bucket=os.environ.get("R2_BUCKET_NAME"),
-                      Key=audio_key, Body=audio_bytes)
+        audio_upload.result()
     except Exception as e:
         print(f"Error uploading audio file: {str(e)}")
         return None, None
 
-    srt_key = f"{uid}_en.srt"
     try:
-        s3.put_object(Bucket=os.environ.get("R2_BUCKET_NAME"),
-                      Key=srt_key, Body=srt_subtitles)
+        srt_upload.result()
     except Exception as e:
         print(f"Error uploading SRT file: {str(e)}")
         return None, None
 
     return audio_key, srt_key
-
-def milliseconds_to_srt_timestamp(milliseconds):
-    """Converts milliseconds to SRT timestamp format (HH:MM:SS,mmm)."""
-    seconds, milliseconds = divmod(milliseconds, 1000)
-    minutes, seconds = divmod(seconds, 60)
-    hours, minutes = divmod(minutes, 60)
-    return f"{hours:02.0f}:{minutes:02.0f}:{seconds:02.0f},{milliseconds:03.0f}" 
-
-def audio(content, uid):
-    speech_text = generate_speech(content)
-    audio_filename, srt_filename = generate_audio(speech_text, uid)
-    if audio_filename and srt_filename:
-        print("Audio and subtitles uploaded to R2 successfully!")
-        return audio_filename, srt_filename
-    else:
-        print("Failed to generate or upload audio and subtitles")
-        return None, None 
\ No newline at end of file
@@ -1,9 +1,14 @@
 import os
-import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import boto3
 import requests
 
+from src import metrics
+from src.limits import limiter
+from src.poller import DubPoller
+from src.r2 import MultipartWriter
+
 s3 = boto3.client(
     's3',
     endpoint_url=os.getenv("R2_ENDPOINT"),
@@ -11,9 +16,20 @@ s3 = boto3.client(
     aws_secret_access_key=os.getenv("R2_SECRET_KEY"),
 )
 
+ELEVENLABS_API_URL = os.getenv("ELEVENLABS_API_URL", "https://api.elevenlabs.io")
+
+# Connect and read timeout of every ElevenLabs request; for the audio stream it bounds each read.
+REQUEST_TIMEOUT = float(os.getenv("ELEVENLABS_TIMEOUT", "30"))
+
+PART_SIZE = int(os.getenv("DUB_PART_SIZE", str(8 * 1024 * 1024)))
+CHUNK_SIZE = 256 * 1024
+
+transfer_pool = ThreadPoolExecutor(max_workers=int(os.getenv("DUB_TRANSFER_WORKERS", "4")),
+                                   thread_name_prefix="dub-transfer")
+
 
 def start_dub(source_url, name, target_language):
-    url = "https://api.elevenlabs.io/v1/dubbing"
+    url = f"{ELEVENLABS_API_URL}/v1/dubbing"
 
     headers = {
         "xi-api-key": os.getenv("ELEVENLABS_API_KEY") 
@@ -31,47 +47,63 @@ def start_dub(source_url, name, target_language):
         "use_profanity_filter": "false"
     }
 
-    response = requests.post(url, headers=headers, data=data)
+    with limiter("elevenlabs").limit() as elevenlabs, metrics.timed("elevenlabs.dub_start"):
+        response = elevenlabs.observe(requests.post(url, headers=headers, data=data, timeout=REQUEST_TIMEOUT))
     return response.json()
 
 def get_dub_status(dubbing_id):
-    url = f"https://api.elevenlabs.io/v1/dubbing/{dubbing_id}"
+    url = f"{ELEVENLABS_API_URL}/v1/dubbing/{dubbing_id}"
 
     headers = {
         "xi-api-key": os.getenv("ELEVENLABS_API_KEY")
     }
 
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
+    with limiter("elevenlabs").limit() as elevenlabs, metrics.timed("elevenlabs.dub_status"):
+        response = elevenlabs.observe(requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT))
+        response.raise_for_status()
     return response.json()["status"]
 
 def get_dub_transcript(dubbing_id, language_code):
-    url = f"https://api.elevenlabs.io/v1/dubbing/{dubbing_id}/transcript/{language_code}?format_type=srt"
+    url = f"{ELEVENLABS_API_URL}/v1/dubbing/{dubbing_id}/transcript/{language_code}?format_type=srt"
 
     headers = {
         "xi-api-key": os.getenv("ELEVENLABS_API_KEY")
     }
 
-    response = requests.get(url, headers=headers) 
-    response.raise_for_status() 
+    with limiter("elevenlabs").limit() as elevenlabs, metrics.timed("elevenlabs.dub_transcript"):
+        response = elevenlabs.observe(requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT))
+        response.raise_for_status()
+    metrics.add_bytes("elevenlabs.dub_transcript", len(response.content))
     return response.text
 
-def get_dubbed_file(dubbing_id, language_code):
-    url = f"https://api.elevenlabs.io/v1/dubbing/{dubbing_id}/audio/{language_code}"
+def stream_dubbed_file(dubbing_id, language_code, chunk_size=CHUNK_SIZE):
+    """Yields the dubbed audio in chunks without holding the whole file in memory."""
+    url = f"{ELEVENLABS_API_URL}/v1/dubbing/{dubbing_id}/audio/{language_code}"
 
     headers = {
         "xi-api-key": os.getenv("ELEVENLABS_API_KEY")
     }
 
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    return response.content
-
-def upload_to_r2(name, target_lang, transcript, audio_content):
-
-    s3.put_object(Bucket=os.getenv("R2_BUCKET_NAME"), Key=f"{name}_{target_lang}.srt", Body=transcript)
-
-    s3.put_object(Bucket=os.getenv("R2_BUCKET_NAME"), Key=f"{name}_{target_lang}.mp3", Body=audio_content)
+    # The download holds an ElevenLabs in-flight slot until the last chunk is read.
+    with limiter("elevenlabs").limit() as elevenlabs, \
+            elevenlabs.observe(requests.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT)) as response:
+        response.raise_for_status()
+        yield from response.iter_content(chunk_size=chunk_size)
+
+def stream_audio_to_r2(dubbing_id, name, target_lang):
+    """Streams the dubbed audio from ElevenLabs into R2 as a multipart upload."""
+    with metrics.timed("dub.audio_stream"), \
+            MultipartWriter(s3, os.getenv("R2_BUCKET_NAME"), f"{name}_{target_lang}.mp3",
+                            part_size=PART_SIZE, content_type="audio/mpeg") as writer:
+        for chunk in stream_dubbed_file(dubbing_id, target_lang):
+            writer.write(chunk)
+    metrics.add_bytes("dub.audio_stream", writer.bytes_written)
+    return writer.bytes_written
+
+def upload_transcript_to_r2(dubbing_id, name, target_lang):
+    transcript = get_dub_transcript(dubbing_id, target_lang)
+    with metrics.timed("r2.put"):
+        s3.put_object(Bucket=os.getenv("R2_BUCKET_NAME"), Key=f"{name}_{target_lang}.srt", Body=transcript)
 
 def file_exists_in_r2(name, target_lang):
     try:
@@ -80,32 +112,32 @@ def file_exists_in_r2(name, target_lang):
     except:
         return False
 
-def dub(file_url, name, target_lang):
+poller = DubPoller(
+    get_dub_status,
+    min_interval=float(os.getenv("DUB_POLL_MIN_INTERVAL", "2")),
+    max_interval=float(os.getenv("DUB_POLL_MAX_INTERVAL", "30")),
+    max_rps=float(os.getenv("DUB_POLL_MAX_RPS", "2")),
+    timeout=float(os.getenv("DUB_TIMEOUT", "150")),
+    poll_workers=int(os.getenv("DUB_POLL_WORKERS", "4")),
+)
+
+def finish_dub(dubbing_id, name, target_lang):
+    transcript_upload = transfer_pool.submit(upload_transcript_to_r2, dubbing_id, name, target_lang)
+    stream_audio_to_r2(dubbing_id, name, target_lang)
+    transcript_upload.result()
+
+def dub_async(file_url, name, target_lang):
+    """Starts a dub and returns a future that resolves once the files are in R2."""
     # Check if the file already exists in R2
     if file_exists_in_r2(name, target_lang):
         print(f"File {name}_{target_lang}.mp3 already exists in R2. Skipping dubbing.")
-        return
+        future = Future()
+        future.set_result(None)
+        return future
 
     dub_info = start_dub(file_url, name, target_lang)
     dubbing_id = dub_info["dubbing_id"]
 
-    timeout = 150
-    start_time = time.time()
-
-    while True:
-
-        status = get_dub_status(dubbing_id)
-
-        if status == "dubbed":
-            break
-        elif status == "failed":
-            raise Exception("Dubbing failed")
-        elif time.time() - start_time > timeout:
-            raise TimeoutError("Dubbing timed out")
-
-        time.sleep(5)
-
-    transcript = get_dub_transcript(dubbing_id, target_lang)
-    audio_content = get_dubbed_file(dubbing_id, target_lang)
-
-    upload_to_r2(name, target_lang, transcript, audio_content) 
\ No newline at end of file
+    return poller.watch(dubbing_id,
+                        expected_duration=dub_info.get("expected_duration_sec"),
+                        on_done=lambda: finish_dub(dubbing_id, name, target_lang))
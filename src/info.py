@@ -3,9 +3,21 @@ import http.client
 import json
 import logging
 import os
+import queue
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import lru_cache
-from src.audio import audio
+from src.audio import NARRATION_INSTRUCTIONS, audio_keys, generate_speech, synthesize_audio, upload_audio
+from src.cache import TTLCache
+from src.jobs import JobQueue, QueueFull
+from src.kv import KVClient, KVError
+from src import metrics
+from src.limits import estimate_tokens, limiter
+from src.singleflight import SingleFlight
+from src.stages import critical_path, run_stages
+from src.text import html_to_text, split_sections
 
 import google.generativeai as genai
 import requests
@@ -22,10 +34,142 @@ CLOUDFLARE_KV_NAMESPACE_ID = os.environ["CLOUDFLARE_KV_NAMESPACE_ID"]
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upstream endpoints; overridden to point the app at local stand-ins (see bench/e2e_bench.py).
+# Bill URLs keep their api.govinfo.gov form and are only rewritten when fetched.
+GOVINFO_BASE_URL = os.getenv("GOVINFO_BASE_URL", "https://api.govinfo.gov")
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
 # Configure session for API requests
 session = requests.Session()
 
-def process_bill_url(url):
+# Execution mode for cold /info requests: "concurrent" runs independent stages
+# on a thread pool, "serial" runs them one after another.
+INFO_EXECUTION_MODE = os.getenv("INFO_EXECUTION_MODE", "concurrent")
+
+# Stage dependency graph of a cold /info request. A stage starts as soon as the
+# stages it depends on are done, so the metadata and HTM fetches overlap, the
+# KV write overlaps the R2 uploads, and latency follows the critical path
+# text -> content -> summary -> narrative -> tts -> upload -> result. When the
+# content lookup finds the same bill text under another URL, the generation
+# stages reuse its summary, narrative and audio instead.
+STAGE_GRAPH = {
+    "metadata": (),
+    "text": (),
+    "content": ("text",),
+    "summary": ("text", "content"),
+    "narrative": ("summary", "content"),
+    "tts": ("narrative", "content"),
+    "upload": ("tts", "content"),
+    "store": ("metadata", "summary", "tts", "content"),
+    "result": ("store", "upload", "narrative", "content"),
+}
+
+# With INFO_AUDIO_MODE=deferred, /info stores and returns the summary with
+# audio_status "pending" and the narrative, TTS and uploads run as a background
+# job that patches the KV record when the audio is ready.
+INFO_AUDIO_MODE = os.getenv("INFO_AUDIO_MODE", "inline")
+
+DEFERRED_STAGE_GRAPH = {
+    "metadata": (),
+    "text": (),
+    "content": ("text",),
+    "summary": ("text", "content"),
+    "store": ("metadata", "summary", "content"),
+    "result": ("store", "content"),
+}
+
+# A pending record whose job is not known to this process (e.g. after a
+# restart) is queued again once it is older than AUDIO_STALE_AFTER seconds.
+AUDIO_STALE_AFTER = float(os.getenv("AUDIO_STALE_AFTER", "600"))
+
+# /audio/<uid> resubmits a failed job until the bill has had AUDIO_MAX_ATTEMPTS
+# attempts. Its ?wait= long-poll re-reads KV every AUDIO_POLL_INTERVAL seconds
+# while the job runs in another worker.
+AUDIO_MAX_ATTEMPTS = int(os.getenv("AUDIO_MAX_ATTEMPTS", "3"))
+AUDIO_POLL_INTERVAL = float(os.getenv("AUDIO_POLL_INTERVAL", "1"))
+
+audio_jobs = JobQueue(max_workers=int(os.getenv("AUDIO_WORKERS", "2")),
+                      max_pending=int(os.getenv("AUDIO_MAX_PENDING", "64")),
+                      name="audio")
+
+# Cleaned bill text longer than SUMMARY_MAP_THRESHOLD characters is split into
+# sections of about SUMMARY_SECTION_CHARS, summarized in parallel, then reduced.
+SUMMARY_MAP_THRESHOLD = int(os.getenv("SUMMARY_MAP_THRESHOLD", "200000"))
+SUMMARY_SECTION_CHARS = int(os.getenv("SUMMARY_SECTION_CHARS", "60000"))
+
+# With SUMMARY_MODE=fused one Gemini call returns both the summary and the
+# narration script, skipping the SambaNova call. A response that fails
+# parse_fused_response falls back to the separate calls.
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "separate")
+FUSED_MIN_NARRATIVE_CHARS = int(os.getenv("FUSED_MIN_NARRATIVE_CHARS", "400"))
+
+summary_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SUMMARY_MAP_WORKERS", "4")),
+                                  thread_name_prefix="summary-map")
+
+stage_executor = ThreadPoolExecutor(max_workers=int(os.getenv("INFO_STAGE_WORKERS", "8")),
+                                    thread_name_prefix="info-stage")
+
+kv_client = KVClient(CLOUDFLARE_ACCOUNT_ID, CLOUDFLARE_KV_NAMESPACE_ID, CLOUDFLARE_API_TOKEN,
+                     base_url=os.getenv("CLOUDFLARE_API_URL", "https://api.cloudflare.com"),
+                     pool_size=int(os.getenv("KV_POOL_SIZE", "8")),
+                     timeout=float(os.getenv("KV_TIMEOUT", "10")))
+
+# In-process tier in front of Cloudflare KV; 404s are remembered briefly.
+kv_cache = TTLCache(max_entries=int(os.getenv("KV_CACHE_MAX_ENTRIES", "1024")),
+                    max_bytes=int(os.getenv("KV_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+                    ttl=float(os.getenv("KV_CACHE_TTL", "3600")),
+                    negative_ttl=float(os.getenv("KV_CACHE_NEGATIVE_TTL", "30")))
+
+# Concurrent cold requests for the same bill share one computation. Setting
+# SINGLEFLIGHT_LOCK_DIR extends this to all workers on the host via file locks.
+inflight = SingleFlight(lock_dir=os.getenv("SINGLEFLIGHT_LOCK_DIR"),
+                        lease_timeout=float(os.getenv("SINGLEFLIGHT_LEASE_TIMEOUT", "300")))
+
+# Cold bills of a batch request are processed on this pool, so a batch never
+# runs more than INFO_BATCH_WORKERS cold paths at once.
+INFO_BATCH_MAX_URLS = int(os.getenv("INFO_BATCH_MAX_URLS", "50"))
+
+batch_pool = ThreadPoolExecutor(max_workers=int(os.getenv("INFO_BATCH_WORKERS", "4")),
+                                thread_name_prefix="info-batch")
+
+def process_bill_urls(urls):
+    """Yields (url, result) for each unique URL, cached bills first, the rest as they finish."""
+
+    urls = list(dict.fromkeys(urls))
+    uids = {url: generate_uid_from_url(url) for url in urls if is_valid_govinfo_url(url)}
+    cached = get_bill_infos_from_kv(uids.values())
+
+    misses = []
+    for url in urls:
+        if uids.get(url) in cached:
+            yield url, refresh_cached_bill_info(cached[uids[url]], url)
+        else:
+            misses.append(url)
+
+    # Bulk-read misses are remembered by kv_cache, so process_bill_url goes straight to the cold path.
+    futures = {batch_pool.submit(process_bill_url, url): url for url in misses}
+    for future in as_completed(futures):
+        yield futures[future], future.result()
+
+
+def refresh_cached_bill_info(bill_info, url):
+    """Applies refresh_pending_audio to a cached hit, keeping the cached record if that fails."""
+
+    if bill_info.get('audio_status') != "pending":
+        return bill_info
+    try:
+        return refresh_pending_audio(bill_info, url)
+    except Exception as e:
+        logger.error(f"Error refreshing pending audio of {bill_info['id']}: {e}")
+        return bill_info
+
+
+def process_bill_url(url, on_event=None):
+    """Returns the bill info for a govinfo URL, or {'error': ...}.
+
+    On a cold run, ``on_event(event, data)`` is called with the metadata,
+    summary and audio events of stage_event as their stages finish.
+    """
 
     try:
         if not is_valid_govinfo_url(url):
@@ -33,60 +177,353 @@ def process_bill_url(url):
 
         uid = generate_uid_from_url(url)
         if existing_info := get_bill_info_from_kv(uid):
-            return existing_info
+            return refresh_cached_bill_info(existing_info, url)
 
         bill_type = get_bill_type_from_url(url)
-        if bill_type == "bill":
-            bill_info = get_bill_info(url)
-        elif bill_type == "law":
-            bill_info = get_law_info(url)
-        else:
+        if bill_type not in ("bill", "law"):
             return {'error': 'Unsupported bill type'}
 
-        if not bill_info:
-            return {'error': 'Failed to retrieve bill information'}
+        return inflight.do(uid, lambda: build_bill_info(url, uid, bill_type, on_event),
+                           recheck=lambda: get_bill_info_from_kv(uid, use_cache=False))
+
+    except ValueError as e:
+        logger.error(f"Value error: {e}")
+        return {'error': str(e)}
+    except requests.exceptions.RequestException as e:
+        logger.error(f"API request error: {e}")
+        return {'error': f'API request error: {e}'}
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        return {'error': f'An unexpected error occurred: {e}'}
+
+
+def stream_bill_url(url, keepalive=15.0):
+    """Yields (event, data) pairs for a bill as its stages finish, ending with ("result", bill info).
+
+    While nothing has happened for `keepalive` seconds a ("keepalive", None) pair is yielded.
+    """
+
+    events = queue.Queue()
+
+    def run():
+        events.put(("result", process_bill_url(url, on_event=lambda event, data: events.put((event, data)))))
 
-        base_url = url.replace("/summary", "")
-        htm_link = f"{base_url}/htm?api_key={GOVINFO_API_KEY}"
-        pdf_link = f"{base_url}/pdf?api_key={GOVINFO_API_KEY}"
+    threading.Thread(target=run, name="info-stream", daemon=True).start()
+    while True:
+        try:
+            event, data = events.get(timeout=keepalive)
+        except queue.Empty:
+            yield "keepalive", None
+            continue
+        yield event, data
+        if event == "result":
+            return
 
-        summary, _ = summarize_bill_text(htm_link, url)
-        bill_info['summary'] = summary
 
+def bill_links(url):
+    """Returns the HTM and PDF links of a bill's summary URL."""
+
+    base_url = url.replace("/summary", "")
+    return f"{base_url}/htm?api_key={GOVINFO_API_KEY}", f"{base_url}/pdf?api_key={GOVINFO_API_KEY}"
+
+
+def stage_event(name, value, url, uid, bill_type):
+    """Returns the (event, data) sent to streaming clients when a stage finishes, or None."""
+
+    if name == "metadata":
+        htm_link, pdf_link = bill_links(url)
+        return "metadata", dict(value, htm_link=htm_link, pdf_link=pdf_link, json_type=bill_type, id=uid)
+    if name == "summary":
+        return "summary", {"summary": value}
+    if name == "upload":
+        return "audio", {"audio_path": value[0], "srt_path": value[1]}
+    return None
+
+
+def build_bill_info(url, uid, bill_type, on_event=None):
+    """Runs the cold path for a bill and returns the stored bill info."""
+
+    def on_done(name, value):
+        if on_event and (event := stage_event(name, value, url, uid, bill_type)):
+            on_event(*event)
+
+    executor = stage_executor if INFO_EXECUTION_MODE == "concurrent" else None
+    timings = {}
+    results = run_stages(build_stages(url, uid, bill_type), executor, timings, on_done)
+
+    for name, seconds in timings.items():
+        metrics.observe(f"info.{name}", seconds)
+
+    path, total = critical_path(stage_graph(), timings)
+    logger.info(f"Processed {uid} in {total:.2f}s along {' -> '.join(path)}")
+
+    return results["result"]
+
+
+def stage_graph():
+    """Returns the stage graph of the configured audio mode."""
+
+    return DEFERRED_STAGE_GRAPH if INFO_AUDIO_MODE == "deferred" else STAGE_GRAPH
+
+
+def queue_audio(bill_info, url=None, content_hash=None, narrative=None):
+    """Queues the background audio job of a pending bill; returns the job, or None if the queue is full."""
+
+    try:
+        return audio_jobs.submit(bill_info['id'], generate_deferred_audio, dict(bill_info), url, content_hash,
+                                 narrative)
+    except QueueFull as e:
+        logger.warning(f"Audio for {bill_info['id']} not queued, it will be retried later: {e}")
+        return None
+
+
+def refresh_pending_audio(bill_info, url):
+    """Re-reads a pending record past the local cache and requeues its job if it was lost."""
+
+    bill_info = get_bill_info_from_kv(bill_info['id'], use_cache=False) or bill_info
+    if (bill_info.get('audio_status') == "pending" and audio_jobs.find(bill_info['id']) is None
+            and time.time() - bill_info.get('audio_requested_at', 0) > AUDIO_STALE_AFTER):
+        bill_info['audio_requested_at'] = time.time()
+        store_bill_info_in_kv(bill_info, url)
+        queue_audio(bill_info, url)
+    return bill_info
+
+
+def generate_deferred_audio(bill_info, url=None, content_hash=None, narrative=None):
+    """Background job: narrates the summary, uploads the audio and patches the bill's KV record."""
+
+    try:
+        narrative = narrative or generate_speech(bill_info['summary'])
+        audio_bytes, srt_subtitles = synthesize_audio(narrative)
+        if audio_bytes is None:
+            audio_path, srt_path = None, None
+        else:
+            audio_path, srt_path = upload_audio(audio_bytes, srt_subtitles, bill_info['id'])
+    except Exception:
+        bill_info['audio_status'] = "failed"
+        store_bill_info_in_kv(bill_info, url)
+        raise
+
+    bill_info['audio_path'] = audio_path
+    bill_info['srt_path'] = srt_path
+    bill_info['audio_status'] = "ready" if audio_path and srt_path else "failed"
+    store_bill_info_in_kv(bill_info, url)
+    if bill_info['audio_status'] == "failed":
+        # Fails the job too, so retry_failed_audio can submit the bill again.
+        raise RuntimeError(f"Audio generation failed for {bill_info['id']}")
+
+    if content_hash and bill_info['audio_status'] == "ready":
+        store_content_record(content_hash, {
+            "summary": bill_info['summary'],
+            "narrative": narrative,
+            "audio_path": audio_path,
+            "srt_path": srt_path,
+        })
+    return bill_info['audio_status']
+
+
+def retry_failed_audio(bill_info):
+    """Resubmits the audio job of a failed record unless it has used up AUDIO_MAX_ATTEMPTS."""
+
+    uid = bill_info['id']
+    attempts = bill_info.get('audio_attempts', 1)
+    if attempts >= AUDIO_MAX_ATTEMPTS:
+        return bill_info
+
+    def resubmit():
+        bill_info.update(audio_status="pending", audio_requested_at=time.time(), audio_attempts=attempts + 1)
+        store_bill_info_in_kv(bill_info)
+        queue_audio(bill_info)
+        return bill_info
+
+    # Concurrent requests for the same failed bill resubmit it once.
+    return inflight.do(f"audio:{uid}", resubmit, recheck=lambda: (
+        (record := get_bill_info_from_kv(uid, use_cache=False)) and record.get('audio_status') != "failed"
+        and record))
+
+
+def get_audio_status(uid, wait=0):
+    """Returns the audio status of a bill, waiting up to `wait` seconds while it is pending.
+
+    A job running in this process is waited on directly; otherwise KV is
+    re-read every AUDIO_POLL_INTERVAL seconds until the deadline. A failed
+    job is resubmitted first.
+    """
+
+    deadline = time.monotonic() + wait
+    bill_info = get_bill_info_from_kv(uid)
+    if not bill_info:
+        return None
+    if bill_info.get('audio_status') in ("pending", "failed"):
+        bill_info = get_bill_info_from_kv(uid, use_cache=False) or bill_info
+    if bill_info.get('audio_status') == "failed":
+        bill_info = retry_failed_audio(bill_info)
+
+    while bill_info.get('audio_status') == "pending" and (remaining := deadline - time.monotonic()) > 0:
+        job = audio_jobs.find(uid)
+        if job and job['status'] in ("queued", "running"):
+            audio_jobs.wait(job['id'], remaining)
+        else:
+            time.sleep(min(AUDIO_POLL_INTERVAL, remaining))
+        bill_info = get_bill_info_from_kv(uid, use_cache=False) or bill_info
+
+    return {
+        'id': uid,
+        'audio_status': bill_info.get('audio_status') or ("ready" if bill_info.get('audio_path') else "failed"),
+        'audio_path': bill_info.get('audio_path'),
+        'srt_path': bill_info.get('srt_path'),
+    }
+
+
+def build_stages(url, uid, bill_type):
+    """Binds the stages of STAGE_GRAPH to one bill URL."""
+
+    htm_link, pdf_link = bill_links(url)
+
+    def metadata(_):
+        bill_info = get_bill_info(url) if bill_type == "bill" else get_law_info(url)
+        if not bill_info:
+            raise ValueError('Failed to retrieve bill information')
+        return bill_info
+
+    def text(_):
+        return clean_bill_text(fetch_bill_text(htm_link))
+
+    def content(results):
+        if not results["text"]:
+            return None, None
+        content_hash = generate_content_hash(results["text"])
+        return content_hash, get_content_record(content_hash)
+
+    # Narration script produced by the summary stage in fused mode.
+    fused = {}
+
+    def summary(results):
+        if record := results["content"][1]:
+            return record["summary"]
+        if results["text"] is None:
+            return "Error loading bill text for summarization."
+        if not results["text"]:
+            return "No content available for summarization."
+        if SUMMARY_MODE == "fused":
+            summary_text, fused["narrative"] = summarize_and_narrate(results["text"])
+            return summary_text
+        return summarize_text(results["text"])
+
+    def narrative(results):
+        if record := results["content"][1]:
+            return record["narrative"]
+        return fused.get("narrative") or generate_speech(results["summary"])
+
+    def tts(results):
+        if results["content"][1]:
+            return None, None
+        return synthesize_audio(results["narrative"])
+
+    def upload(results):
+        if record := results["content"][1]:
+            return record["audio_path"], record["srt_path"]
+        audio_bytes, srt_subtitles = results["tts"]
+        if audio_bytes is None:
+            return None, None
+        return upload_audio(audio_bytes, srt_subtitles, uid)
+
+    def new_bill_info(results, audio_path, srt_path):
+        bill_info = dict(results["metadata"])
+        bill_info['summary'] = results["summary"]
         bill_info['htm_link'] = htm_link
         bill_info['pdf_link'] = pdf_link
+        bill_info['audio_path'] = audio_path
+        bill_info['srt_path'] = srt_path
+        bill_info['json_type'] = bill_type
+        bill_info['id'] = uid
+        return bill_info
 
-        audio_path, srt_path = audio(summary, uid)
-        if audio_path and srt_path:
-            bill_info['audio_path'] = audio_path
-            bill_info['srt_path'] = srt_path
+    def store(results):
+        # The R2 keys are deterministic, so the record is written while the
+        # uploads are still running, flagged so no worker caches it, and
+        # rewritten by the result stage once they finish.
+        audio_bytes, _ = results["tts"]
+        if record := results["content"][1]:
+            audio_path, srt_path = record["audio_path"], record["srt_path"]
+        elif audio_bytes is not None:
+            audio_path, srt_path = audio_keys(uid)
         else:
-            bill_info['audio_path'] = None
-            bill_info['srt_path'] = None
+            audio_path, srt_path = None, None
+
+        bill_info = new_bill_info(results, audio_path, srt_path)
+        if audio_path and not record:
+            bill_info['uploads_pending'] = True
+        store_bill_info_in_kv(bill_info, url)
+        return bill_info
+
+    def result(results):
+        bill_info = results["store"]
+        audio_path, srt_path = results["upload"]
+        content_hash, record = results["content"]
+        uploads_pending = bill_info.pop('uploads_pending', False)
+        if not (audio_path and srt_path):
             logger.warning("Failed to generate audio and subtitles")
+            if bill_info['audio_path']:
+                bill_info['audio_path'] = None
+                bill_info['srt_path'] = None
+                store_bill_info_in_kv(bill_info, url)
+            return bill_info
+        if uploads_pending:
+            store_bill_info_in_kv(bill_info, url)
+        if content_hash and not record:
+            store_content_record(content_hash, {
+                "summary": results["summary"],
+                "narrative": results["narrative"],
+                "audio_path": audio_path,
+                "srt_path": srt_path,
+            })
+        return bill_info
 
-        bill_info['json_type'] = bill_type
-        bill_info['id'] = uid
+    def store_deferred(results):
+        if record := results["content"][1]:
+            bill_info = new_bill_info(results, record["audio_path"], record["srt_path"])
+            bill_info['audio_status'] = "ready"
+        else:
+            bill_info = new_bill_info(results, None, None)
+            bill_info['audio_status'] = "pending"
+            bill_info['audio_requested_at'] = time.time()
 
         store_bill_info_in_kv(bill_info, url)
         return bill_info
 
-    except ValueError as e:
-        logger.error(f"Value error: {e}")
-        return {'error': str(e)}
-    except requests.exceptions.RequestException as e:
-        logger.error(f"API request error: {e}")
-        return {'error': f'API request error: {e}'}
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        return {'error': f'An unexpected error occurred: {e}'}
+    def result_deferred(results):
+        bill_info = results["store"]
+        if bill_info['audio_status'] == "pending":
+            queue_audio(bill_info, url, results["content"][0], fused.get("narrative"))
+        return bill_info
+
+    stages = {
+        "metadata": metadata,
+        "text": text,
+        "content": content,
+        "summary": summary,
+        "narrative": narrative,
+        "tts": tts,
+        "upload": upload,
+        "store": store,
+        "result": result,
+    }
+    if INFO_AUDIO_MODE == "deferred":
+        stages["store"] = store_deferred
+        stages["result"] = result_deferred
+
+    graph = stage_graph()
+    return {name: (graph[name], stages[name]) for name in graph}
 
 
 def get_bill_info(url):
 
     try:
-        response = session.get(f"{url}?api_key={GOVINFO_API_KEY}")
-        response.raise_for_status()
+        with limiter("govinfo").limit() as govinfo, metrics.timed("govinfo.metadata"):
+            response = govinfo.observe(session.get(f"{govinfo_url(url)}?api_key={GOVINFO_API_KEY}"))
+            response.raise_for_status()
+        metrics.add_bytes("govinfo.metadata", len(response.content))
         return parse_bill_info(response.json())  # Return only bill_info
     except requests.exceptions.RequestException as e:
         logger.error(f"Error getting bill information: {e}")
@@ -119,8 +556,10 @@ def parse_bill_info(bill_data):
 def get_law_info(url):
 
     try:
-        response = session.get(f"{url}?api_key={GOVINFO_API_KEY}")
-        response.raise_for_status()
+        with limiter("govinfo").limit() as govinfo, metrics.timed("govinfo.metadata"):
+            response = govinfo.observe(session.get(f"{govinfo_url(url)}?api_key={GOVINFO_API_KEY}"))
+            response.raise_for_status()
+        metrics.add_bytes("govinfo.metadata", len(response.content))
         return parse_law_info(response.json())  # Return only law_info
     except requests.exceptions.RequestException as e:
         logger.error(f"Error getting law information: {e}")
@@ -138,25 +577,105 @@ def parse_law_info(law_data):
     return info
 
 
-def summarize_bill_text(htm_link, url):
+def clean_bill_text(html):
+    """Reduces the govinfo HTM to plain text, or returns None if it could not be loaded."""
+
+    if html is None:
+        return None
+    start = time.perf_counter()
+    text = html_to_text(html)
+    logger.info(f"cleanup: {len(html)} -> {len(text)} chars in {time.perf_counter() - start:.3f}s")
+    return text
+
+
+def summarize_text(text):
+    """Summarizes bill text directly, or map-reduce style when it is above the size threshold."""
+
+    return generate_summary(summary_input(text))
+
+
+def summarize_and_narrate(text):
+    """Returns (summary, narrative) from one fused call, or (summary, None) after falling back."""
+
+    source = summary_input(text)
+    if fused := generate_fused(source):
+        return fused
+    logger.warning("fused: response rejected, falling back to separate summary and narration")
+    metrics.add_error("gemini.fused")
+    return generate_summary(source), None
+
+
+def summary_input(text):
+    """Returns the text the summary model sees: the bill itself, or its section summaries when it is long."""
+
+    if len(text) <= SUMMARY_MAP_THRESHOLD:
+        return text
+
+    sections = split_sections(text, SUMMARY_SECTION_CHARS)
+    logger.info(f"map: summarizing {len(sections)} sections of {len(text)} chars")
+    section_summaries = list(summary_pool.map(metrics.bind(generate_section_summary), sections))
+
+    return "\n\n".join(
+        f"Section {i} summary:\n{section_summary}"
+        for i, section_summary in enumerate(section_summaries, 1)
+    )
+
+
+def fetch_bill_text(htm_link):
 
     try:
-        response = session.get(htm_link)
-        response.raise_for_status()
-        if response.text:
-            summary = generate_summary(response.text)
-            uid = generate_uid_from_url(url)
-            return summary, uid
-        return "No content available for summarization.", None
+        with limiter("govinfo").limit() as govinfo, metrics.timed("govinfo.htm"):
+            response = govinfo.observe(session.get(govinfo_url(htm_link)))
+            response.raise_for_status()
+        metrics.add_bytes("govinfo.htm", len(response.content))
+        return response.text
     except requests.exceptions.RequestException as e:
         logger.error(f"Error loading {htm_link}: {e}")
-        return "Error loading bill text for summarization.", None
+        return None
+
+
+def govinfo_url(url):
+    """Points a govinfo URL at GOVINFO_BASE_URL."""
+    return url.replace("https://api.govinfo.gov", GOVINFO_BASE_URL, 1)
+
+
+def configure_gemini():
+    """Configures the Gemini client, over REST to GEMINI_API_ENDPOINT when one is set."""
+    if GEMINI_API_ENDPOINT:
+        genai.configure(api_key=GEMINI_API_KEY, transport="rest",
+                        client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+    else:
+        genai.configure(api_key=GEMINI_API_KEY)
+
+
+SUMMARY_INSTRUCTIONS = """
+        1. Analyze the provided legislative data and rewrite it into a clear, detailed summary that any citizen can easily understand.
+        2. Explain what are the changes that are happening with this bill/law/amendment.
+        3. Stay neutral about the political views and simply be an effective summarizer for normal citizens.
+        4. Avoid legislative jargon and focus on simplifying complex terms.
+        5. Provide a summary in 5 to 7 bullet points, being concise and highlighting the key aspects.
+
+        Respond in markdown format. Do not add any pretext and greetings at the end or beginning of the summary.
+        Just return the points.
+        Do not include any backticks (```) for formatting.
+"""
+
+# Fused mode asks for the summary and the narration script in one JSON response.
+FUSED_INSTRUCTIONS = f"""
+You are given the text of a bill or law. Return a JSON object with two string fields.
+
+"summary": a summary that follows these instructions:
+{SUMMARY_INSTRUCTIONS}
+"narrative": the same summary rewritten as a narration script that follows these instructions:
+{NARRATION_INSTRUCTIONS}
+Return only the JSON object.
+"""
 
 
 @lru_cache(maxsize=1)
 def get_model():
 
-    genai.configure(api_key=GEMINI_API_KEY)
+    configure_gemini()
     return genai.GenerativeModel(
         model_name="gemini-1.5-flash-exp-0827",
         generation_config={
@@ -172,25 +691,118 @@ def get_model():
             HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
             HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
         },
-        system_instruction="""
-        1. Analyze the provided legislative data and rewrite it into a clear, detailed summary that any citizen can easily understand.
-        2. Explain what are the changes that are happening with this bill/law/amendment.
-        3. Stay neutral about the political views and simply be an effective summarizer for normal citizens.
-        4. Avoid legislative jargon and focus on simplifying complex terms.
-        5. Provide a summary in 5 to 7 bullet points, being concise and highlighting the key aspects.
+        system_instruction=SUMMARY_INSTRUCTIONS
+    )
 
-        Respond in markdown format. Do not add any pretext and greetings at the end or beginning of the summary.
-        Just return the points.
-        Do not include any backticks (```) for formatting.
+
+@lru_cache(maxsize=1)
+def get_section_model():
+
+    configure_gemini()
+    return genai.GenerativeModel(
+        model_name="gemini-1.5-flash-exp-0827",
+        generation_config={
+            "temperature": 0.3,
+            "max_output_tokens": 600,
+            "response_mime_type": "text/plain",
+        },
+        safety_settings={
+            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+        },
+        system_instruction="""
+        You are given one part of a longer bill or law.
+        List the concrete changes, requirements, funding amounts and affected groups it contains as short plain-text notes.
+        Skip definitions, clerical amendments and table of contents entries.
+        Do not add any pretext, greetings or conclusions.
         """
     )
 
 
+@lru_cache(maxsize=1)
+def get_fused_model():
+
+    configure_gemini()
+    return genai.GenerativeModel(
+        model_name="gemini-1.5-flash-exp-0827",
+        generation_config={
+            "temperature": 0.7,
+            "top_p": 0.95,
+            "top_k": 64,
+            "max_output_tokens": 2500,
+            "response_mime_type": "application/json",
+        },
+        safety_settings={
+            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+        },
+        system_instruction=FUSED_INSTRUCTIONS
+    )
+
+
+def generate_content(model, text, stage):
+    """Calls a Gemini model and logs tokens in/out and latency for the stage."""
+
+    with limiter("gemini").limit(tokens=estimate_tokens(text)), metrics.timed("gemini"):
+        start = time.perf_counter()
+        response = model.generate_content(text)
+        elapsed = time.perf_counter() - start
+
+    usage = getattr(response, "usage_metadata", None)
+    tokens_in = getattr(usage, "prompt_token_count", None)
+    tokens_out = getattr(usage, "candidates_token_count", None)
+    logger.info(f"{stage}: {len(text)} chars, {tokens_in} tokens in, {tokens_out} tokens out, {elapsed:.2f}s")
+
+    return response.text if response else None
+
+
 def generate_summary(text):
 
-    model = get_model()
-    summary = model.generate_content(text)
-    return summary.text if summary else "No summary generated."
+    return generate_content(get_model(), text, "summary") or "No summary generated."
+
+
+def generate_fused(text):
+    """Returns (summary, narrative) from one Gemini call, or None if the response is unusable."""
+
+    try:
+        return parse_fused_response(generate_content(get_fused_model(), text, "fused"))
+    except Exception as e:
+        logger.error(f"fused: generation failed: {e}")
+        return None
+
+
+def parse_fused_response(raw):
+    """Validates a fused JSON response and returns (summary, narrative), or None."""
+
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    summary, narrative = data.get("summary"), data.get("narrative")
+    if not (isinstance(summary, str) and isinstance(narrative, str)):
+        return None
+    summary, narrative = summary.strip(), narrative.strip()
+
+    # The summary must be a bullet list and the narrative plain speakable text.
+    bullets = [line for line in summary.splitlines() if line.lstrip().startswith(("-", "*", "•"))]
+    if not 3 <= len(bullets) <= 10:
+        return None
+    if len(narrative) < FUSED_MIN_NARRATIVE_CHARS or re.search(r"[*#`]|^\s*-", narrative, re.MULTILINE):
+        return None
+
+    return summary, narrative
+
+
+def generate_section_summary(text):
+
+    return generate_content(get_section_model(), text, "section summary") or ""
 
 
 def is_valid_govinfo_url(url):
@@ -213,41 +825,116 @@ def generate_uid_from_url(url):
 
     return hashlib.sha256(url.encode('utf-8')).hexdigest()
 
-def store_bill_info_in_kv(bill_info, url):
-
-    uid = generate_uid_from_url(url)
-    payload = json.dumps(bill_info)
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f"Bearer {CLOUDFLARE_API_TOKEN}"
-    }
-    api_url = f"/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/storage/kv/namespaces/{CLOUDFLARE_KV_NAMESPACE_ID}/values/{uid}"
+def store_bill_info_in_kv(bill_info, url=None):
 
-    conn = http.client.HTTPSConnection("api.cloudflare.com")
-    conn.request("PUT", api_url, payload, headers)
-    res = conn.getresponse()
-    if res.status == 200:
+    uid = bill_info['id'] if url is None else generate_uid_from_url(url)
+    if put_json_in_kv(uid, bill_info):
         logger.info(f"Successfully stored bill info with UID: {uid}")
-    else:
-        logger.error(f"Error storing bill info: {res.read().decode('utf-8')}")
 
 
-def get_bill_info_from_kv(uid):
+def get_bill_info_from_kv(uid, use_cache=True):
 
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f"Bearer {CLOUDFLARE_API_TOKEN}"
-    }
-    api_url = f"/client/v4/accounts/{CLOUDFLARE_ACCOUNT_ID}/storage/kv/namespaces/{CLOUDFLARE_KV_NAMESPACE_ID}/values/{uid}"
-
-    conn = http.client.HTTPSConnection("api.cloudflare.com")
-    conn.request("GET", api_url, headers=headers)
-    res = conn.getresponse()
-    if res.status == 200:
-        print("Loaded Info from KV")
-        return json.loads(res.read().decode("utf-8"))
-    elif res.status == 404:
+    return get_json_from_kv(uid, use_cache)
+
+
+def generate_content_hash(text):
+    """Hashes bill text after normalizing case and whitespace."""
+
+    normalized = " ".join(text.split()).lower()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def get_content_record(content_hash):
+    """Returns the summary, narrative and audio keys generated for this bill text, if any."""
+
+    record = get_json_from_kv(f"content:{content_hash}")
+    if record and all(record.get(field) for field in ("summary", "narrative", "audio_path", "srt_path")):
+        logger.info(f"Reusing generated content {content_hash}")
+        return record
+    return None
+
+
+def store_content_record(content_hash, record):
+
+    put_json_in_kv(f"content:{content_hash}", record)
+
+
+def put_json_in_kv(key, value):
+
+    payload = json.dumps(value)
+
+    with metrics.timed("kv.put"):
+        status, body = kv_client.put(key, payload)
+    metrics.add_bytes("kv.put", len(payload))
+    if status == 200:
+        if cacheable(value):
+            kv_cache.set(key, dict(value), size=len(payload))
+        else:
+            kv_cache.invalidate(key)
+        return True
+    metrics.add_error("kv.put")
+    logger.error(f"Error storing {key} in KV: {body.decode('utf-8')}")
+    return False
+
+
+def cacheable(value):
+    """Records that point at R2 objects still being uploaded are never cached."""
+
+    return not value.get('uploads_pending')
+
+
+def get_json_from_kv(key, use_cache=True):
+
+    if use_cache:
+        hit, value = kv_cache.get(key)
+        if hit:
+            return dict(value) if value else None
+
+    with metrics.timed("kv.get"):
+        status, body = kv_client.get(key)
+    metrics.add_bytes("kv.get", len(body))
+    if status == 200:
+        print(f"Loaded {key} from KV")
+        value = json.loads(body.decode("utf-8"))
+        if cacheable(value):
+            kv_cache.set(key, value, size=len(body))
+        return dict(value)
+    elif status == 404:
+        kv_cache.set_missing(key)
         return None
     else:
-        logger.error(f"Error retrieving bill info from KV: {res.read().decode('utf-8')}")
-        return None
\ No newline at end of file
+        metrics.add_error("kv.get")
+        logger.error(f"Error retrieving {key} from KV: {body.decode('utf-8')}")
+        return None
+
+
+def get_bill_infos_from_kv(uids):
+    """Returns the stored bill info for each uid that exists, using one bulk read for cache misses."""
+
+    found = {}
+    misses = []
+    for uid in uids:
+        hit, bill_info = kv_cache.get(uid)
+        if not hit:
+            misses.append(uid)
+        elif bill_info:
+            found[uid] = dict(bill_info)
+
+    if misses:
+        try:
+            # timed() counts the kv.bulk_get error when the read raises.
+            with metrics.timed("kv.bulk_get"):
+                values = kv_client.bulk_get(misses)
+        except (KVError, OSError, http.client.HTTPException, ValueError) as e:
+            # Like a failed single read, a failed bulk read is treated as a miss, without caching it.
+            logger.error(f"Error bulk-reading {len(misses)} bill infos from KV: {e}")
+            return found
+        for uid in misses:
+            if uid in values:
+                if cacheable(values[uid]):
+                    kv_cache.set(uid, values[uid], size=len(json.dumps(values[uid])))
+                found[uid] = dict(values[uid])
+            else:
+                kv_cache.set_missing(uid)
+
+    return found
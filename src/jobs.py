@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class JobQueue:
+    """Runs background jobs on a bounded worker pool and tracks their status.
+
+    Submissions with the same key as a queued, running or recently finished
+    job are merged into that job. Finished jobs are kept for ``retention``
+    seconds so clients can read their result. A job function may return a
+    Future, in which case the worker is released and the job finishes when
+    the future does.
+    """
+
+    def __init__(self, max_workers=4, max_pending=64, retention=3600.0, name="job"):
+        self.max_pending = max_pending
+        self.retention = retention
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Condition()
+        self._jobs = {}
+        self._by_key = {}
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Queues fn(*args, **kwargs) unless a job with the same key exists; returns the job."""
+        with self._lock:
+            self._prune()
+
+            if (job_id := self._by_key.get(key)) and self._jobs[job_id]["status"] != "failed":
+                return dict(self._jobs[job_id])
+
+            active = sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
+            if active >= self.max_pending:
+                raise QueueFull(f"{active} jobs are already pending")
+
+            job = {
+                "id": uuid.uuid4().hex,
+                "status": "queued",
+                "result": None,
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+            self._jobs[job["id"]] = job
+            self._by_key[key] = job["id"]
+            self._executor.submit(self._run, job["id"], fn, args, kwargs)
+            return dict(job)
+
+    def get(self, job_id):
+        """Returns a snapshot of the job, or None if it is unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def find(self, key):
+        """Returns a snapshot of the latest job submitted under `key`, or None."""
+        with self._lock:
+            job = self._jobs.get(self._by_key.get(key))
+            return dict(job) if job else None
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until the job has finished or `timeout` seconds pass; returns its snapshot."""
+        with self._lock:
+            self._lock.wait_for(lambda: self._jobs.get(job_id, {}).get("status") not in ("queued", "running"),
+                                timeout)
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _run(self, job_id, fn, args, kwargs):
+        self._update(job_id, status="running")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._fail(job_id, e)
+            return
+
+        if isinstance(result, Future):
+            result.add_done_callback(lambda future: self._resolve(job_id, future))
+        else:
+            self._update(job_id, status="done", result=result, finished_at=time.time())
+
+    def _resolve(self, job_id, future):
+        if error := future.exception():
+            self._fail(job_id, error)
+        else:
+            self._update(job_id, status="done", result=future.result(), finished_at=time.time())
+
+    def _fail(self, job_id, error):
+        logger.error(f"Job {job_id} failed: {error}")
+        self._update(job_id, status="failed", error=str(error), finished_at=time.time())
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+            self._lock.notify_all()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] and job["finished_at"] < cutoff]
+        if not expired:
+            return
+        for job_id in expired:
+            del self._jobs[job_id]
+        self._by_key = {key: job_id for key, job_id in self._by_key.items() if job_id in self._jobs}
@@ -0,0 +1,121 @@
+import http.client
+import json
+import queue
+import threading
+from urllib.parse import quote, urlsplit
+
+# Errors raised when the server has closed an idle keep-alive connection.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+# Cloudflare limit on keys per bulk read.
+BULK_GET_LIMIT = 100
+
+
+class KVClient:
+    """Cloudflare Workers KV client that reuses keep-alive connections.
+
+    At most ``pool_size`` connections are open at once; idle ones are kept for
+    the next request instead of paying a TCP and TLS handshake every call.
+    """
+
+    def __init__(self, account_id, namespace_id, api_token,
+                 base_url="https://api.cloudflare.com", pool_size=8, timeout=10.0):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.timeout = timeout
+        self.namespace_path = (f"{parts.path.rstrip('/')}/client/v4/accounts/{account_id}"
+                               f"/storage/kv/namespaces/{namespace_id}")
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f"Bearer {api_token}"
+        }
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def get(self, key):
+        """Returns (status, body) for a single KV value."""
+        return self.request("GET", f"/values/{quote(key, safe='')}")
+
+    def put(self, key, value):
+        """Writes a single KV value and returns (status, body)."""
+        return self.request("PUT", f"/values/{quote(key, safe='')}", value)
+
+    def bulk_get(self, keys):
+        """Returns a dict of the JSON values found for the given keys."""
+        values = {}
+        keys = list(keys)
+        for i in range(0, len(keys), BULK_GET_LIMIT):
+            payload = json.dumps({"keys": keys[i:i + BULK_GET_LIMIT], "type": "json"})
+            status, body = self.request("POST", "/bulk/get", payload)
+            if status != 200:
+                raise KVError(status, body)
+            found = json.loads(body)["result"]["values"]
+            values.update({key: value for key, value in found.items() if value is not None})
+        return values
+
+    def request(self, method, path, body=None):
+        """Sends a request on a pooled connection and returns (status, body)."""
+        with self._slots:
+            conn, reused = self._checkout()
+            try:
+                status, data, reusable = self._send(conn, method, path, body)
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                # The server dropped an idle connection; retry once on a fresh one.
+                conn = self._connect()
+                try:
+                    status, data, reusable = self._send(conn, method, path, body)
+                except BaseException:
+                    conn.close()
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+
+            if reusable:
+                self._idle.put(conn)
+            else:
+                conn.close()
+            return status, data
+
+    def close(self):
+        """Closes all idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._connect(), False
+
+    def _connect(self):
+        if self.scheme == "http":
+            return http.client.HTTPConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+
+    def _send(self, conn, method, path, body):
+        conn.request(method, self.namespace_path + path, body, self.headers)
+        res = conn.getresponse()
+        data = res.read()
+        return res.status, data, not res.will_close
+
+
+class KVError(Exception):
+    """Raised when a bulk KV request is rejected."""
+
+    def __init__(self, status, body):
+        super().__init__(f"KV request failed with status {status}: {body.decode('utf-8', 'replace')}")
+        self.status = status
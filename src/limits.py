@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from src.ratelimit import TokenBucket, retry_after_seconds
+
+# Upstream APIs and their default limits. Each can be overridden with
+# <NAME>_MAX_IN_FLIGHT, <NAME>_RPM, <NAME>_TPM and <NAME>_ACQUIRE_TIMEOUT;
+# a rate of 0 disables that bucket. "Tokens" are whatever the provider bills
+# by: LLM tokens for Gemini and SambaNova, characters for ElevenLabs.
+PROVIDERS = {
+    "govinfo": {"max_in_flight": 8, "rpm": 0, "tpm": 0},
+    "gemini": {"max_in_flight": 4, "rpm": 0, "tpm": 0},
+    "sambanova": {"max_in_flight": 4, "rpm": 0, "tpm": 0},
+    "elevenlabs": {"max_in_flight": 4, "rpm": 0, "tpm": 0},
+}
+
+
+class LimitExceeded(Exception):
+    """Raised when a provider slot cannot be acquired within the caller's timeout."""
+
+
+class ProviderLimiter:
+    """Bounds the calls made to one upstream API.
+
+    A call holds one of ``max_in_flight`` slots while it runs and takes one
+    request from the requests-per-minute bucket and ``tokens`` from the
+    tokens-per-minute bucket before it starts. Both buckets hold a minute's
+    budget, so short bursts pass straight through. ``timeout=0`` fails fast
+    with LimitExceeded instead of queueing.
+    """
+
+    def __init__(self, name, max_in_flight=4, rpm=0, tpm=0, timeout=None):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._requests = TokenBucket(rpm / 60, capacity=rpm) if rpm else None
+        self._tokens = TokenBucket(tpm / 60, capacity=tpm) if tpm else None
+
+        self._budget_lock = threading.Lock()
+        self._paused_until = 0.0
+
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0,
+            "rejected": 0,
+            "in_flight": 0,
+            "waiting": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    @classmethod
+    def from_env(cls, name, max_in_flight=4, rpm=0, tpm=0):
+        prefix = name.upper()
+        timeout = os.getenv(f"{prefix}_ACQUIRE_TIMEOUT")
+        return cls(name,
+                   max_in_flight=int(os.getenv(f"{prefix}_MAX_IN_FLIGHT", str(max_in_flight))),
+                   rpm=float(os.getenv(f"{prefix}_RPM", str(rpm))),
+                   tpm=float(os.getenv(f"{prefix}_TPM", str(tpm))),
+                   timeout=float(timeout) if timeout else None)
+
+    @contextmanager
+    def limit(self, tokens=1, timeout=None):
+        """Holds a slot for the duration of the block; waits up to `timeout` seconds to get one."""
+        deadline = self._deadline(timeout)
+        entered = self._enter()
+        acquired = False
+        try:
+            if self._slots.acquire(timeout=self._remaining(deadline)):
+                acquired = True
+                while not self._take_budget(tokens):
+                    wait = self._budget_wait(tokens)
+                    remaining = self._remaining(deadline)
+                    if remaining is not None and wait > remaining:
+                        self._slots.release()
+                        acquired = False
+                        break
+                    time.sleep(max(wait, 0.001))
+        finally:
+            self._admit(entered, acquired)
+        try:
+            yield self
+        finally:
+            self._release()
+
+    def pause(self, seconds):
+        """Stops new calls for `seconds`, e.g. after the provider answered 429 with Retry-After."""
+        with self._budget_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def observe(self, response, default_retry_after=10):
+        """Pauses the provider when `response` is a 429 and returns the response unchanged."""
+        if response.status_code == 429:
+            self.pause(retry_after_seconds(response.headers.get("Retry-After"), default_retry_after))
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["max_in_flight"] = self.max_in_flight
+        stats["budget_wait_seconds"] = self._budget_wait(1)
+        return stats
+
+    def _deadline(self, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        return None if timeout is None else time.monotonic() + timeout
+
+    @staticmethod
+    def _remaining(deadline):
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def _budget_wait(self, tokens):
+        """Returns how long until one request and `tokens` tokens are available."""
+        waits = [self._paused_until - time.monotonic(), 0.0]
+        if self._requests:
+            waits.append(self._requests.wait_time(1))
+        if self._tokens:
+            # A call larger than the whole bucket waits for a full bucket and leaves it in debt.
+            waits.append(self._tokens.wait_time(min(tokens, self._tokens.capacity)))
+        return max(waits)
+
+    def _take_budget(self, tokens):
+        """Takes one request and `tokens` tokens if both are available right now."""
+        with self._budget_lock:
+            if self._budget_wait(tokens) > 0:
+                return False
+            if self._requests:
+                self._requests.acquire(1, timeout=0)
+            if self._tokens:
+                self._tokens.acquire(tokens, timeout=0)
+            return True
+
+    def _enter(self):
+        with self._lock:
+            self._counters["waiting"] += 1
+        return time.monotonic()
+
+    def _admit(self, entered, acquired):
+        waited = time.monotonic() - entered
+        with self._lock:
+            self._counters["waiting"] -= 1
+            self._counters["wait_seconds"] += waited
+            self._counters["max_wait_seconds"] = max(self._counters["max_wait_seconds"], waited)
+            if acquired:
+                self._counters["requests"] += 1
+                self._counters["in_flight"] += 1
+            else:
+                self._counters["rejected"] += 1
+        if not acquired:
+            raise LimitExceeded(f"{self.name}: no capacity within the timeout")
+
+    def _release(self):
+        with self._lock:
+            self._counters["in_flight"] -= 1
+        self._slots.release()
+
+
+limiters = {name: ProviderLimiter.from_env(name, **defaults) for name, defaults in PROVIDERS.items()}
+
+
+def limiter(name):
+    """Returns the shared limiter of an upstream API."""
+    return limiters[name]
+
+
+def configure(name, **overrides):
+    """Replaces a provider's limiter, keeping any setting not overridden."""
+    current = limiters[name]
+    settings = {
+        "max_in_flight": current.max_in_flight,
+        "rpm": current._requests.capacity if current._requests else 0,
+        "tpm": current._tokens.capacity if current._tokens else 0,
+        "timeout": current.timeout,
+    }
+    settings.update(overrides)
+    limiters[name] = ProviderLimiter(name, **settings)
+    return limiters[name]
+
+
+def stats():
+    """Returns queue depth, in-flight calls and wait times for every provider."""
+    return {name: provider.stats() for name, provider in limiters.items()}
+
+
+def estimate_tokens(text):
+    """Rough LLM token count used to charge the tokens-per-minute bucket before a call."""
+    return max(1, len(text) // 4)
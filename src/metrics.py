@@ -0,0 +1,113 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_lock = threading.Lock()
+_histograms = {}  # stage -> [bucket counts..., +Inf count, sum]
+_bytes = {}
+_errors = {}
+
+# Timings of the request being served, for the Server-Timing header. Stage
+# threads see it through the context copied by run_stages and bind.
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def observe(stage, seconds):
+    """Records one latency sample for a stage."""
+    with _lock:
+        histogram = _histograms.setdefault(stage, [0] * (len(BUCKETS) + 1) + [0.0])
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[len(BUCKETS)] += 1
+        histogram[-1] += seconds
+
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+def add_bytes(stage, count):
+    """Counts bytes sent or received by a stage."""
+    with _lock:
+        _bytes[stage] = _bytes.get(stage, 0) + count
+
+
+def add_error(stage):
+    with _lock:
+        _errors[stage] = _errors.get(stage, 0) + 1
+
+
+@contextmanager
+def timed(stage):
+    """Times the block as `stage`, counting an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        add_error(stage)
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def collect():
+    """Collects the (stage, seconds) samples recorded while serving one request."""
+    timings = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def bind(fn):
+    """Wraps fn so it runs in the caller's context when handed to a thread pool."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def server_timing(timings):
+    """Formats collected samples as a Server-Timing header, summing repeated stages."""
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage.replace('.', '_')};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+def render():
+    """Returns every metric in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {stage: list(values) for stage, values in _histograms.items()}
+        sent = dict(_bytes)
+        errors = dict(_errors)
+
+    lines = [
+        "# HELP app_stage_duration_seconds Latency of each request stage and upstream call.",
+        "# TYPE app_stage_duration_seconds histogram",
+    ]
+    for stage, values in sorted(histograms.items()):
+        for bound, count in zip(BUCKETS, values):
+            lines.append(f'app_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'app_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {values[len(BUCKETS)]}')
+        lines.append(f'app_stage_duration_seconds_sum{{stage="{stage}"}} {values[-1]}')
+        lines.append(f'app_stage_duration_seconds_count{{stage="{stage}"}} {values[len(BUCKETS)]}')
+
+    lines += [
+        "# HELP app_stage_bytes_total Bytes transferred by each stage.",
+        "# TYPE app_stage_bytes_total counter",
+    ]
+    lines += [f'app_stage_bytes_total{{stage="{stage}"}} {count}' for stage, count in sorted(sent.items())]
+
+    lines += [
+        "# HELP app_stage_errors_total Errors raised by each stage.",
+        "# TYPE app_stage_errors_total counter",
+    ]
+    lines += [f'app_stage_errors_total{{stage="{stage}"}} {count}' for stage, count in sorted(errors.items())]
+
+    return "\n".join(lines) + "\n"
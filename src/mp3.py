@@ -0,0 +1,56 @@
+BITRATES_KBPS = {
+    "mpeg1": (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    "mpeg2": (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+
+def skip_id3(data):
+    """Returns the offset of the first byte after a leading ID3v2 tag."""
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return 10 + size
+    return 0
+
+
+def parse_frame_header(data, offset):
+    """Returns (frame_length, samples, sample_rate) for a Layer III frame header, or None."""
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+
+    version = (data[offset + 1] >> 3) & 0x03
+    layer = (data[offset + 1] >> 1) & 0x03
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 0x03
+    padding = (data[offset + 2] >> 1) & 0x01
+
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    if version == 3:
+        bitrate = BITRATES_KBPS["mpeg1"][bitrate_index] * 1000
+        return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+    bitrate = BITRATES_KBPS["mpeg2"][bitrate_index] * 1000
+    return 72 * bitrate // sample_rate + padding, 576, sample_rate
+
+
+def duration(data):
+    """Returns the playing time of MPEG Layer III audio in seconds by walking its frames."""
+    offset = skip_id3(data)
+    seconds = 0.0
+    while offset + 4 <= len(data):
+        header = parse_frame_header(data, offset)
+        if header is None:
+            offset += 1
+            continue
+        frame_length, samples, sample_rate = header
+        seconds += samples / sample_rate
+        offset += frame_length
+    return seconds
@@ -0,0 +1,140 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class DubPoller:
+    """Polls every in-flight dubbing job from one scheduler thread.
+
+    Each job is polled on its own adaptive schedule: while a job is well before
+    its expected finish time (derived from the media length) the gap between
+    polls halves towards it, and once it is overdue the gap grows with the
+    overrun. All status requests share a global budget of ``max_rps`` and run
+    on a small poll pool, so a slow request never stalls the scheduler. When a
+    job is dubbed, ``on_done`` runs on a callback pool and its return value
+    resolves the future returned by ``watch``.
+    """
+
+    def __init__(self, status_fn, min_interval=2.0, max_interval=30.0, max_rps=2.0,
+                 timeout=150.0, processing_ratio=1.0, max_errors=3, callback_workers=4, poll_workers=4):
+        self.status_fn = status_fn
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_rps = max_rps
+        self.timeout = timeout
+        self.processing_ratio = processing_ratio
+        self.max_errors = max_errors
+
+        self._callbacks = ThreadPoolExecutor(max_workers=callback_workers, thread_name_prefix="dub-callback")
+        self._polls = ThreadPoolExecutor(max_workers=poll_workers, thread_name_prefix="dub-poll")
+        self._cond = threading.Condition()
+        self._heap = []
+        self._jobs = {}
+        self._seq = itertools.count()
+        self._last_request = 0.0
+        self._thread = None
+
+    def watch(self, dubbing_id, expected_duration=None, on_done=None):
+        """Starts tracking a dubbing job and returns a future for its completion."""
+        now = time.monotonic()
+        expected = (expected_duration or 0) * self.processing_ratio
+        job = {
+            "future": Future(),
+            "on_done": on_done,
+            "started": now,
+            "expected": expected,
+            "deadline": now + max(self.timeout, 2 * expected),
+            "errors": 0,
+        }
+        with self._cond:
+            self._jobs[dubbing_id] = job
+            self._schedule(dubbing_id, now + self._interval(0.0, expected))
+            self._ensure_thread()
+            self._cond.notify()
+        return job["future"]
+
+    def pending(self):
+        """Returns the number of jobs that are still being polled."""
+        with self._cond:
+            return len(self._jobs)
+
+    def _interval(self, elapsed, expected):
+        if elapsed < expected:
+            interval = (expected - elapsed) / 2
+        else:
+            interval = self.min_interval + 0.2 * (elapsed - expected)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def _schedule(self, dubbing_id, when):
+        heapq.heappush(self._heap, (when, next(self._seq), dubbing_id))
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="dub-poller", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                _, _, dubbing_id = heapq.heappop(self._heap)
+                job = self._jobs.get(dubbing_id)
+                if job is None:
+                    continue
+
+                # Global request budget shared by all jobs.
+                while (wait := self._last_request + 1.0 / self.max_rps - time.monotonic()) > 0:
+                    self._cond.wait(wait)
+                self._last_request = time.monotonic()
+
+            # A job is rescheduled only once its poll returns, so it is never polled twice at once.
+            self._polls.submit(self._poll, dubbing_id, job)
+
+    def _poll(self, dubbing_id, job):
+        try:
+            status = self.status_fn(dubbing_id)
+        except Exception as e:
+            job["errors"] += 1
+            logger.warning(f"Error polling dubbing {dubbing_id} ({job['errors']}/{self.max_errors}): {e}")
+            if job["errors"] >= self.max_errors:
+                self._finish(dubbing_id, error=e)
+                return
+            status = None
+        else:
+            job["errors"] = 0
+
+        now = time.monotonic()
+        if status == "dubbed":
+            self._finish(dubbing_id)
+        elif status == "failed":
+            self._finish(dubbing_id, error=Exception("Dubbing failed"))
+        elif now > job["deadline"]:
+            self._finish(dubbing_id, error=TimeoutError("Dubbing timed out"))
+        else:
+            with self._cond:
+                self._schedule(dubbing_id, now + self._interval(now - job["started"], job["expected"]))
+                self._cond.notify()
+
+    def _finish(self, dubbing_id, error=None):
+        with self._cond:
+            job = self._jobs.pop(dubbing_id)
+
+        if error is not None:
+            job["future"].set_exception(error)
+        elif job["on_done"] is None:
+            job["future"].set_result(dubbing_id)
+        else:
+            self._callbacks.submit(self._complete, job)
+
+    def _complete(self, job):
+        try:
+            job["future"].set_result(job["on_done"]())
+        except Exception as e:
+            job["future"].set_exception(e)
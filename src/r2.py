@@ -0,0 +1,88 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# S3 (and R2) reject multipart parts smaller than this, except the last one.
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class MultipartWriter:
+    """File-like writer that streams data into an R2 object as a multipart upload.
+
+    At most one part is buffered in memory. Objects smaller than one part are
+    sent with a single put_object; if the writer is closed after an error the
+    multipart upload is aborted so no orphaned parts are left behind.
+    """
+
+    def __init__(self, s3, bucket, key, part_size=8 * 1024 * 1024, content_type=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.content_type = content_type
+        self.bytes_written = 0
+
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def close(self):
+        """Flushes the buffered data and completes the upload."""
+        if self._upload_id is None:
+            self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer), **self._extra())
+            self._buffer.clear()
+            return
+
+        try:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+                self._buffer.clear()
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        except Exception:
+            self.abort()
+            raise
+
+    def abort(self):
+        self._buffer.clear()
+        if self._upload_id is None:
+            return
+        try:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        except Exception as e:
+            logger.error(f"Error aborting multipart upload of {self.key}: {e}")
+        self._upload_id = None
+
+    def _upload_part(self, body):
+        if self._upload_id is None:
+            response = self.s3.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self._extra())
+            self._upload_id = response["UploadId"]
+
+        part_number = len(self._parts) + 1
+        response = self.s3.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                                       PartNumber=part_number, Body=body)
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def _extra(self):
+        return {"ContentType": self.content_type} if self.content_type else {}
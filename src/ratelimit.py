@@ -0,0 +1,81 @@
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+def retry_after_seconds(value, default=60):
+    """Parses a Retry-After header given in seconds or as an HTTP date; `default` if missing or invalid."""
+    if value is None:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        return max(0.0, seconds) if math.isfinite(seconds) else default
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker that calls the same API.
+
+    ``rate`` tokens are added per second up to ``capacity``. ``pause`` blocks
+    all callers until a point in time, which is how a Retry-After from one
+    worker is honoured by the others.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1, timeout=None):
+        """Takes tokens, waiting up to `timeout` seconds (forever if None); returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                wait = self._reserve(tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def wait_time(self, tokens=1):
+        """Returns how long a caller would currently have to wait for tokens."""
+        with self._lock:
+            self._refill()
+            return max(self._paused_until - time.monotonic(),
+                       (tokens - self._tokens) / self.rate if self._tokens < tokens else 0.0, 0.0)
+
+    def pause(self, seconds):
+        """Blocks all callers for `seconds`, e.g. after a 429 with Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, tokens):
+        """Takes the tokens if possible and returns 0, otherwise returns how long to wait."""
+        self._refill()
+        paused = self._paused_until - time.monotonic()
+        if paused > 0:
+            return paused
+        if self._tokens >= min(tokens, self.capacity):
+            self._tokens -= tokens
+            return 0.0
+        return (min(tokens, self.capacity) - self._tokens) / self.rate
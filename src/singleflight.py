@@ -0,0 +1,90 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one computation.
+
+    Within a process, callers that arrive while a key is in flight wait for the
+    leader's result instead of running ``fn`` themselves. When ``lock_dir`` is
+    set, leaders in different processes on the same host also serialize on a
+    per-key file lock. Every leader calls ``recheck`` after taking the lock, so
+    it picks up a result another worker stored after this worker's own lookup
+    missed, whether or not it had to wait for the lock.
+    """
+
+    def __init__(self, lock_dir=None, lease_timeout=300.0):
+        self.lock_dir = lock_dir
+        self.lease_timeout = lease_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, fn, recheck=None):
+        """Returns fn() for the key, sharing one call between concurrent callers."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+
+        if not leader:
+            return call.result()
+
+        try:
+            result = self._run(key, fn, recheck)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self):
+        """Returns the number of keys currently being computed in this process."""
+        with self._lock:
+            return len(self._calls)
+
+    def _run(self, key, fn, recheck):
+        if not self.lock_dir:
+            return fn()
+
+        with open(os.path.join(self.lock_dir, f"{key}.lock"), "w") as lock_file:
+            self._acquire(lock_file)
+            try:
+                if recheck and (result := recheck()):
+                    return result
+                return fn()
+            finally:
+                self._release(lock_file)
+
+    def _acquire(self, lock_file):
+        """Takes the file lease, waiting up to lease_timeout for another process to release it."""
+        import fcntl
+
+        deadline = time.monotonic() + self.lease_timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    # The holder is stuck; compute without the lease rather than fail.
+                    logger.warning(f"Lease {lock_file.name} not released after {self.lease_timeout}s")
+                    return
+                time.sleep(0.1)
+
+    def _release(self, lock_file):
+        import fcntl
+
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
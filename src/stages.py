@@ -0,0 +1,105 @@
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+def topological_order(graph):
+    """Returns stage names ordered so every stage comes after its dependencies."""
+    order = []
+    visiting = set()
+    done = set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Stage graph has a cycle through '{name}'")
+        visiting.add(name)
+        for dep in graph[name]:
+            if dep not in graph:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name in graph:
+        visit(name)
+    return order
+
+
+def critical_path(graph, timings):
+    """Returns the slowest dependency chain and its total duration in seconds."""
+    finish = {}
+    previous = {}
+    for name in topological_order(graph):
+        deps = graph[name]
+        slowest = max(deps, key=lambda dep: finish[dep], default=None)
+        finish[name] = timings.get(name, 0.0) + (finish[slowest] if slowest else 0.0)
+        previous[name] = slowest
+
+    if not finish:
+        return [], 0.0
+
+    name = max(finish, key=finish.get)
+    total = finish[name]
+    path = []
+    while name:
+        path.append(name)
+        name = previous[name]
+    return path[::-1], total
+
+
+def run_stages(stages, executor=None, timings=None, on_done=None):
+    """Runs a graph of stages and returns their results keyed by stage name.
+
+    ``stages`` maps a name to ``(dependencies, fn)``, where ``fn`` receives a
+    dict with the results of the stages finished so far. With an executor every
+    stage is submitted, in a copy of the caller's context, as soon as its
+    dependencies are done, so the wall time is set by the critical path; without one the stages run inline in dependency
+    order. ``on_done(name, result)`` is called from the calling thread as each
+    stage finishes. The first stage error is re-raised and no further stages
+    are started.
+    """
+    results = {}
+    if timings is None:
+        timings = {}
+
+    def call(name, fn, inputs):
+        start = time.perf_counter()
+        try:
+            return fn(inputs)
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    order = topological_order({name: deps for name, (deps, _) in stages.items()})
+
+    if executor is None:
+        for name in order:
+            results[name] = call(name, stages[name][1], results)
+            if on_done:
+                on_done(name, results[name])
+        return results
+
+    pending = list(order)
+    running = {}
+    while pending or running:
+        for name in list(pending):
+            deps, fn = stages[name]
+            if all(dep in results for dep in deps):
+                running[executor.submit(contextvars.copy_context().run, call, name, fn, dict(results))] = name
+                pending.remove(name)
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            try:
+                results[name] = future.result()
+            except BaseException:
+                for other in running:
+                    other.cancel()
+                raise
+            if on_done:
+                on_done(name, results[name])
+
+    return results
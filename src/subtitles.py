@@ -0,0 +1,112 @@
+import os
+from array import array
+from collections import namedtuple
+
+MIN_CUE_DURATION = float(os.getenv("SUBTITLE_MIN_DURATION", "1.5"))
+MAX_CUE_DURATION = float(os.getenv("SUBTITLE_MAX_DURATION", "7.0"))
+MAX_CUE_CHARS = int(os.getenv("SUBTITLE_MAX_CHARS", "84"))
+
+BREAK_AFTER = frozenset(".,!?")
+
+Cue = namedtuple("Cue", ["start", "end", "text"])
+
+
+def words_from_alignment(alignment):
+    """Splits an ElevenLabs alignment into words in one pass.
+
+    Returns the joined text plus arrays of word start/end character offsets and
+    word start/end times in seconds.
+    """
+    chars = alignment["characters"]
+    starts = alignment["character_start_times_seconds"]
+    ends = alignment["character_end_times_seconds"]
+    text = "".join(chars)
+
+    word_first = array("l")
+    word_last = array("l")
+    word_start = array("d")
+    word_end = array("d")
+
+    first = None
+    for i, char in enumerate(text):
+        if char.isspace():
+            if first is not None:
+                word_first.append(first)
+                word_last.append(i)
+                word_start.append(starts[first])
+                word_end.append(ends[i - 1])
+                first = None
+        elif first is None:
+            first = i
+    if first is not None:
+        word_first.append(first)
+        word_last.append(len(text))
+        word_start.append(starts[first])
+        word_end.append(ends[len(text) - 1])
+
+    return text, word_first, word_last, word_start, word_end
+
+
+def segment(alignment, min_duration=MIN_CUE_DURATION, max_duration=MAX_CUE_DURATION, max_chars=MAX_CUE_CHARS):
+    """Groups an alignment into subtitle cues in linear time.
+
+    Words are added to the current cue until it would exceed ``max_duration`` or
+    ``max_chars``. A cue is also closed after a word ending in punctuation once
+    it has lasted at least ``min_duration`` seconds.
+    """
+    text, word_first, word_last, word_start, word_end = words_from_alignment(alignment)
+
+    cues = []
+    cue_words = []
+    cue_chars = 0
+    cue_start = 0.0
+
+    def close():
+        cues.append(Cue(cue_start, word_end[cue_words[-1]], " ".join(text[word_first[w]:word_last[w]] for w in cue_words)))
+
+    for w in range(len(word_first)):
+        length = word_last[w] - word_first[w]
+        if cue_words and (cue_chars + 1 + length > max_chars or word_end[w] - cue_start > max_duration):
+            close()
+            cue_words = []
+
+        if not cue_words:
+            cue_start = word_start[w]
+            cue_chars = length
+        else:
+            cue_chars += 1 + length
+        cue_words.append(w)
+
+        if text[word_last[w] - 1] in BREAK_AFTER and word_end[w] - cue_start >= min_duration:
+            close()
+            cue_words = []
+
+    if cue_words:
+        close()
+
+    return cues
+
+
+def format_timestamp(seconds, separator=","):
+    """Formats seconds as HH:MM:SS,mmm (SRT) or HH:MM:SS.mmm (WebVTT)."""
+    milliseconds = max(0, round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+def to_srt(cues):
+    """Renders cues as an SRT document."""
+    return "".join(
+        f"{i}\n{format_timestamp(cue.start)} --> {format_timestamp(cue.end)}\n{cue.text}\n\n"
+        for i, cue in enumerate(cues, 1)
+    )
+
+
+def to_vtt(cues):
+    """Renders cues as a WebVTT document."""
+    return "WEBVTT\n\n" + "".join(
+        f"{format_timestamp(cue.start, '.')} --> {format_timestamp(cue.end, '.')}\n{cue.text}\n\n"
+        for cue in cues
+    )
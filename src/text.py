@@ -0,0 +1,115 @@
+import re
+from html.parser import HTMLParser
+
+SKIP_TAGS = frozenset(["script", "style", "head", "title"])
+BLOCK_TAGS = frozenset(["p", "div", "br", "pre", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "table"])
+
+# Boilerplate lines that govinfo wraps around the bill text.
+BOILERPLATE = re.compile(
+    r"""^\s*(
+        <DOC>|<all>|
+        \[Congressional\ Bills\ .*\]|
+        \[Public\ Law\ .*\]|
+        \[From\ the\ U\.S\.\ Government\ (Publishing|Printing)\ Office.*\]|
+        \[\[Page\ .*\]\]|
+        \[[A-Z][^\]]*\((IH|IS|RH|RS|RFS|RFH|EH|ES|ENR|PCS|PCH|RDS|RDH|ATH|ATS|CPH|CPS)\)\]|
+        [_\-=\s]{5,}|
+        Calendar\ No\.\ \d+|
+        U\.S\.\ GOVERNMENT\ (PUBLISHING|PRINTING)\ OFFICE.*|
+        VerDate.*|
+        Jkt\ \d+.*
+    )\s*$""",
+    re.VERBOSE | re.IGNORECASE,
+)
+
+SECTION_HEADING = re.compile(r"^\s*(SEC(TION)?\.\s+\d+|TITLE\s+[IVXLC]+|DIVISION\s+[A-Z])\b", re.MULTILINE)
+
+
+class TextExtractor(HTMLParser):
+    """Collects the visible text of an HTML document."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skipping += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    """Strips markup and govinfo boilerplate from a bill's HTM into compact plain text."""
+    extractor = TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+
+    lines = []
+    blank = False
+    for line in "".join(extractor.parts).splitlines():
+        if BOILERPLATE.match(line):
+            continue
+        line = " ".join(line.split())
+        if not line:
+            blank = bool(lines)
+            continue
+        if blank:
+            lines.append("")
+            blank = False
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def split_sections(text, max_chars):
+    """Splits text at section headings into chunks of roughly max_chars."""
+    starts = [match.start() for match in SECTION_HEADING.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])]
+
+    chunks = []
+    current = ""
+    for section in sections:
+        for piece in split_long(section, max_chars):
+            if current and len(current) + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current += piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def split_long(section, max_chars):
+    """Splits a single oversized section at paragraph boundaries."""
+    if len(section) <= max_chars:
+        return [section]
+
+    pieces = []
+    current = ""
+    for paragraph in section.split("\n\n"):
+        paragraph += "\n\n"
+        while len(paragraph) > max_chars:
+            pieces.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) > max_chars:
+            pieces.append(current)
+            current = paragraph
+        else:
+            current += paragraph
+    if current:
+        pieces.append(current)
+    return pieces
@@ -0,0 +1,39 @@
+from utils import data
+
+
+def package(package_id, last_modified):
+    return {"packageId": package_id, "lastModified": last_modified, "docClass": "hr"}
+
+
+def test_update_top_index_builds_missing_index_from_catalog(monkeypatch):
+    catalog = [package(f"BILLS-{n}", f"2024-01-{n:02d}T00:00:00Z") for n in range(1, 21)]
+    written = {}
+    monkeypatch.setattr(data, "load_top_index", lambda key: None)
+    monkeypatch.setattr(data, "load_data_from_r2", lambda key: {"packages": catalog})
+    monkeypatch.setattr(data, "update_data_in_r2", lambda value, key: written.__setitem__(key, value))
+
+    changed = package("BILLS-new", "2024-02-01T00:00:00Z")
+    index = data.update_top_index(data.R2_TOP_BILLS_KEY, [changed], data.R2_BILLS_KEY, "catalog/bills")
+
+    top = [item["packageId"] for item in index.top(21)]
+    assert top[0] == "BILLS-new"
+    assert len(top) == 21
+    assert written[data.R2_TOP_BILLS_KEY] == index.to_dict()
+
+
+def test_partitioned_bootstrap_keeps_rare_doc_classes(monkeypatch):
+    shards = {
+        "catalog/bills/congress=118/2024-02.ndjson": [package(f"BILLS-hr{n}", f"2024-02-{n:02d}T00:00:00Z")
+                                                      for n in range(1, 6)],
+        "catalog/bills/congress=118/2024-01.ndjson": [dict(package("BILLS-sres1", "2024-01-01T00:00:00Z"),
+                                                           docClass="sres")],
+    }
+    monkeypatch.setenv("CATALOG_LAYOUT", "partitioned")
+    monkeypatch.setattr(data, "TOP_INDEX_CAPACITY", 3)
+    monkeypatch.setattr(data.catalog, "load_manifest", lambda prefix: {"shards": dict.fromkeys(shards)})
+    monkeypatch.setattr(data.catalog, "load_shard", shards.__getitem__)
+
+    index = data.bootstrap_top_index(data.R2_BILLS_KEY, "catalog/bills")
+
+    assert [item["packageId"] for item in index.top(3)] == ["BILLS-hr5", "BILLS-hr4", "BILLS-hr3"]
+    assert [item["packageId"] for item in index.top(3, "sres")] == ["BILLS-sres1"]
@@ -0,0 +1,61 @@
+import json
+from types import SimpleNamespace
+
+from utils import download
+
+
+def write_page(directory, name, packages):
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / name).write_text(json.dumps({"packages": packages}))
+
+
+def test_merge_backfill_keeps_newest_copy_of_overlapping_packages(tmp_path, monkeypatch):
+    backfill_dir = tmp_path / "backfill"
+    monkeypatch.setattr(download, "backfill_dir", str(backfill_dir))
+    write_page(backfill_dir / "partition_000", "page_00000.json", [
+        {"packageId": "A", "lastModified": "2024-01-01T00:00:00Z"},
+        {"packageId": "B", "lastModified": "2024-01-02T00:00:00Z"},
+    ])
+    write_page(backfill_dir / "partition_001", "page_00000.json", [
+        {"packageId": "A", "lastModified": "2024-02-01T00:00:00Z"},
+        {"packageId": "B", "lastModified": "2024-01-02T00:00:00Z"},
+    ])
+
+    output = tmp_path / "bills.json"
+    download.merge_backfill(str(output))
+
+    packages = json.loads(output.read_text())["packages"]
+    assert sorted((p["packageId"], p["lastModified"]) for p in packages) == [
+        ("A", "2024-02-01T00:00:00Z"),
+        ("B", "2024-01-02T00:00:00Z"),
+    ]
+
+
+def test_backfill_rerun_resumes_the_saved_plan(tmp_path, monkeypatch):
+    monkeypatch.setattr(download, "backfill_dir", str(tmp_path / "backfill"))
+    monkeypatch.setattr(download, "plan_file", str(tmp_path / "backfill" / "plan.json"))
+
+    start, end, partitions = download.resolve_plan(end="2024-01-01T00:00:00Z", partitions=2)
+    download.save_plan(start, end, partitions)
+
+    assert download.resolve_plan() == (start, end, 2)
+    assert download.resolve_plan(partitions=4) == (start, end, 4)
+
+
+def test_download_partition_discards_pages_of_a_changed_range(tmp_path, monkeypatch):
+    monkeypatch.setattr(download, "backfill_dir", str(tmp_path))
+    monkeypatch.setattr(download, "plan_file", str(tmp_path / "plan.json"))
+    partition_dir = tmp_path / "partition_000"
+    write_page(partition_dir, "page_00000.json", [{"packageId": "old", "lastModified": "2020"}])
+    write_page(partition_dir, "page_00001.json", [{"packageId": "old2", "lastModified": "2020"}])
+    (partition_dir / "state.json").write_text(json.dumps({
+        "start": "2018-01-01T00:00:00Z", "end": "2019-01-01T00:00:00Z",
+        "pages": 2, "nextPage": "https://example.com/next", "done": False}))
+    monkeypatch.setattr(download, "fetch_page", lambda *args: {
+        "packages": [{"packageId": "new", "lastModified": "2021"}], "nextPage": None})
+
+    start, end, _ = download.resolve_plan("2020-01-01T00:00:00Z", "2021-01-01T00:00:00Z", 1)
+    state = download.download_partition(0, start, end, None, SimpleNamespace(update=lambda n: None))
+
+    assert state["done"] and state["pages"] == 1
+    assert [p["packageId"] for p in download.iter_packages(download.backfill_files())] == ["new"]
@@ -0,0 +1,28 @@
+import threading
+
+from src.poller import DubPoller
+
+
+def test_hung_status_request_does_not_stall_other_jobs():
+    release = threading.Event()
+
+    def status(dubbing_id):
+        if dubbing_id == "hung":
+            release.wait(5)
+        return "dubbed"
+
+    poller = DubPoller(status, min_interval=0.01, max_rps=100, poll_workers=2)
+    hung = poller.watch("hung")
+    done = poller.watch("quick", on_done=lambda: "uploaded")
+
+    assert done.result(timeout=2) == "uploaded"
+    assert not hung.done()
+    release.set()
+    assert hung.result(timeout=2) == "hung"
+
+
+def test_job_is_polled_again_until_dubbed():
+    statuses = iter(["dubbing", "dubbing", "dubbed"])
+    poller = DubPoller(lambda dubbing_id: next(statuses), min_interval=0.01, max_rps=100)
+
+    assert poller.watch("job").result(timeout=2) == "job"
@@ -0,0 +1,51 @@
+import pytest
+
+from bench import fakes
+from src.r2 import MIN_PART_SIZE, MultipartWriter
+
+boto3 = pytest.importorskip("boto3")
+
+
+@pytest.fixture
+def store():
+    server = fakes.s3().start()
+    client = boto3.client("s3", endpoint_url=server.url, region_name="auto",
+                          aws_access_key_id="test", aws_secret_access_key="test")
+    yield server, client
+    server.stop()
+
+
+def test_multipart_writer_uploads_several_parts(store):
+    server, client = store
+    data = bytes(range(256)) * (MIN_PART_SIZE * 5 // 2 // 256)
+
+    with MultipartWriter(client, "bucket", "dub.mp3", part_size=MIN_PART_SIZE) as writer:
+        for i in range(0, len(data), 256 * 1024):
+            writer.write(data[i:i + 256 * 1024])
+
+    assert len(writer._parts) == 3
+    assert server.objects["bucket/dub.mp3"] == data
+    assert not server.uploads
+
+
+def test_multipart_writer_aborts_upload_on_error(store):
+    server, client = store
+
+    with pytest.raises(RuntimeError):
+        with MultipartWriter(client, "bucket", "dub.mp3", part_size=MIN_PART_SIZE) as writer:
+            writer.write(b"\0" * (MIN_PART_SIZE + 1))
+            assert server.uploads
+            raise RuntimeError("stream interrupted")
+
+    assert "bucket/dub.mp3" not in server.objects
+    assert not server.uploads
+
+
+def test_multipart_writer_puts_small_objects_in_one_request(store):
+    server, client = store
+
+    with MultipartWriter(client, "bucket", "dub.srt") as writer:
+        writer.write("1\n00:00:00,000 --> 00:00:01,000\nHola\n")
+
+    assert server.objects["bucket/dub.srt"].startswith(b"1\n")
+    assert not server.uploads
@@ -0,0 +1,18 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from src.ratelimit import retry_after_seconds
+
+
+def test_retry_after_seconds_parses_delay_and_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    assert retry_after_seconds("120") == 120
+    assert 25 < retry_after_seconds(format_datetime(retry_at, usegmt=True)) <= 30
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+
+def test_retry_after_seconds_falls_back_to_default():
+    assert retry_after_seconds(None, 10) == 10
+    assert retry_after_seconds("soon", 10) == 10
+    assert retry_after_seconds("inf", 10) == 10
@@ -0,0 +1,127 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from utils.merge import by_last_modified, index_items
+
+# Cloudflare R2 (AWS S3 compatible) configuration
+R2_ACCESS_KEY = os.getenv("R2_ACCESS_KEY")
+R2_SECRET_KEY = os.getenv("R2_SECRET_KEY")
+R2_ENDPOINT = os.getenv("R2_ENDPOINT")
+R2_BUCKET = "elevenlabs-hackathon"
+
+# Partitioned catalog layout:
+#   <prefix>/manifest.json                      shard keys with counts and newest lastModified
+#   <prefix>/congress=<n>/<YYYY-MM>.ndjson      one package per line, newest first
+# Packages are sharded by congress and the month they were issued, which does
+# not change when a package is modified, so an update rewrites only the shards
+# of the packages it touched.
+R2_BILLS_PREFIX = "catalog/bills"
+R2_LAWS_PREFIX = "catalog/laws"
+
+s3 = boto3.client(
+    's3',
+    aws_access_key_id=R2_ACCESS_KEY,
+    aws_secret_access_key=R2_SECRET_KEY,
+    endpoint_url=R2_ENDPOINT
+)
+
+io_pool = ThreadPoolExecutor(max_workers=int(os.getenv("CATALOG_IO_WORKERS", "8")),
+                             thread_name_prefix="catalog-io")
+
+
+def shard_key(prefix, item):
+    """Returns the shard a package belongs to."""
+    issued = item.get("dateIssued") or item["lastModified"]
+    return f"{prefix}/congress={item.get('congress', 'unknown')}/{issued[:7]}.ndjson"
+
+
+def empty_manifest():
+    return {"version": 1, "lastModified": None, "count": 0, "shards": {}}
+
+
+def load_manifest(prefix):
+    """Loads the catalog manifest, or an empty one if the catalog does not exist yet."""
+    try:
+        response = s3.get_object(Bucket=R2_BUCKET, Key=f"{prefix}/manifest.json")
+        return json.loads(response['Body'].read())
+    except s3.exceptions.NoSuchKey:
+        print(f"Manifest {prefix}/manifest.json not found in R2. Starting fresh.")
+        return empty_manifest()
+
+
+def save_manifest(prefix, manifest):
+    s3.put_object(Bucket=R2_BUCKET, Key=f"{prefix}/manifest.json",
+                  Body=json.dumps(manifest, separators=(",", ":")))
+
+
+def load_shard(key):
+    """Loads the packages of one shard."""
+    try:
+        response = s3.get_object(Bucket=R2_BUCKET, Key=key)
+    except s3.exceptions.NoSuchKey:
+        return []
+    return [json.loads(line) for line in response['Body'].iter_lines() if line]
+
+
+def save_shard(key, items):
+    """Writes a shard as NDJSON, newest lastModified first."""
+    items = sorted(items, key=by_last_modified, reverse=True)
+    body = "".join(json.dumps(item, separators=(",", ":")) + "\n" for item in items)
+    s3.put_object(Bucket=R2_BUCKET, Key=key, Body=body.encode("utf-8"),
+                  ContentType="application/x-ndjson")
+    return items
+
+
+def apply_changes(prefix, manifest, changes, key_field="packageId"):
+    """Rewrites only the shards touched by `changes` and returns the updated manifest."""
+    touched = {}
+    for item in changes.values():
+        touched.setdefault(shard_key(prefix, item), []).append(item)
+
+    def rewrite(key):
+        index = index_items(load_shard(key), key_field)
+        for item in touched[key]:
+            current = index.get(item[key_field])
+            if current is None or item["lastModified"] >= current["lastModified"]:
+                index[item[key_field]] = item
+        return key, save_shard(key, index.values())
+
+    for key, items in io_pool.map(rewrite, touched):
+        manifest["shards"][key] = {"count": len(items), "lastModified": items[0]["lastModified"]}
+        print(f"Rewrote shard {key} ({len(items)} packages)")
+
+    shards = manifest["shards"].values()
+    manifest["count"] = sum(shard["count"] for shard in shards)
+    manifest["lastModified"] = max((shard["lastModified"] for shard in shards), default=None)
+    save_manifest(prefix, manifest)
+    return manifest
+
+
+def iter_packages(prefix, manifest=None):
+    """Yields every package in the catalog, one shard at a time."""
+    manifest = manifest or load_manifest(prefix)
+    for shard in io_pool.map(load_shard, manifest["shards"]):
+        yield from shard
+
+
+def load_newest(prefix, count, manifest=None):
+    """Loads the `count` most recently modified packages, reading as few shards as possible."""
+    manifest = manifest or load_manifest(prefix)
+    shards = sorted(manifest["shards"].items(), key=lambda shard: shard[1]["lastModified"], reverse=True)
+
+    items = []
+    for key, shard in shards:
+        # Every remaining shard is older than the count-th newest package found so far.
+        if len(items) >= count and items[count - 1]["lastModified"] >= shard["lastModified"]:
+            break
+        items = sorted(items + load_shard(key), key=by_last_modified, reverse=True)[:count]
+    return items
+
+
+def migrate_to_partitions(items, prefix):
+    """Writes a monolithic package list out as a partitioned catalog."""
+    manifest = empty_manifest()
+    return apply_changes(prefix, manifest, index_items(items))
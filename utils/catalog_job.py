@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import catalog, update
+from utils.data import (R2_BILLS_KEY, R2_LAWS_KEY, R2_TOP_BILLS_KEY, R2_TOP_LAWS_KEY, TOP_COUNT,
+                        TOP_INDEX_CAPACITY, bootstrap_top_index, load_top_index, update_data_in_r2,
+                        write_data_json)
+from utils.topn import TopIndex
+
+# One entry per govinfo collection maintained by the job.
+COLLECTIONS = {
+    "bills": {
+        "url": "https://api.govinfo.gov/collections/BILLS/2018-01-28T20%3A18%3A10Z",
+        "key": R2_BILLS_KEY,
+        "prefix": catalog.R2_BILLS_PREFIX,
+        "index_key": R2_TOP_BILLS_KEY,
+    },
+    "laws": {
+        "url": "https://api.govinfo.gov/collections/PLAW/2018-01-28T20%3A18%3A10Z",
+        "key": R2_LAWS_KEY,
+        "prefix": catalog.R2_LAWS_PREFIX,
+        "index_key": R2_TOP_LAWS_KEY,
+    },
+}
+
+
+def refresh_collection(collection):
+    """Updates one collection and returns its top-N index plus the R2 writes it needs.
+
+    The catalog is downloaded at most once. The top-N index is built from the
+    merged catalog already in memory, or updated from the delta when the
+    catalog is partitioned (bootstrapped from a scan of every shard on the first run).
+    """
+    if os.getenv("CATALOG_LAYOUT") == "partitioned":
+        changes = update.fetch_and_update_partitioned(collection["url"], collection["prefix"],
+                                                     collection["key"])
+        index = load_top_index(collection["index_key"])
+        if index is None:
+            # First run: the shards already include this run's changes.
+            index = bootstrap_top_index(collection["key"], collection["prefix"])
+        index.update(changes.values())
+        return index, []
+
+    all_items, changes, updated = update.update_catalog(collection["url"], collection["key"])
+    index = TopIndex.build(all_items, TOP_INDEX_CAPACITY)
+    writes = [(update.save_data, all_items, collection["key"])] if updated else []
+    print(f"{collection['key']}: {len(changes)} changed packages, {len(all_items)} total")
+    return index, writes
+
+
+def main():
+    """Updates bills and laws concurrently, then writes catalogs, indexes and data.json in parallel."""
+    with ThreadPoolExecutor(max_workers=len(COLLECTIONS)) as executor:
+        results = dict(zip(COLLECTIONS, executor.map(refresh_collection, COLLECTIONS.values())))
+
+    bills_index, bills_writes = results["bills"]
+    laws_index, laws_writes = results["laws"]
+
+    writes = bills_writes + laws_writes + [
+        (update_data_in_r2, bills_index.to_dict(), R2_TOP_BILLS_KEY),
+        (update_data_in_r2, laws_index.to_dict(), R2_TOP_LAWS_KEY),
+        (write_data_json, bills_index, laws_index, TOP_COUNT, os.getenv("TOP_BY_CLASS") == "1"),
+    ]
+    with ThreadPoolExecutor(max_workers=len(writes)) as executor:
+        for future in [executor.submit(fn, *args) for fn, *args in writes]:
+            future.result()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@ from botocore.exceptions import ClientError
 import re
 from datetime import datetime
 
+from utils import catalog
+from utils.topn import TopIndex
+
 # Cloudflare R2 Configuration (AWS S3 Compatible)
 R2_ACCESS_KEY = os.getenv("R2_ACCESS_KEY")
 R2_SECRET_KEY = os.getenv("R2_SECRET_KEY")
@@ -13,6 +16,11 @@ R2_BUCKET_NAME = "elevenlabs-hackathon"
 R2_BILLS_KEY = "bills.json"
 R2_LAWS_KEY = "laws.json"
 R2_DATA_KEY = "data.json"
+R2_TOP_BILLS_KEY = "top_index_bills.json"
+R2_TOP_LAWS_KEY = "top_index_laws.json"
+
+TOP_COUNT = int(os.getenv("TOP_COUNT", "10"))
+TOP_INDEX_CAPACITY = int(os.getenv("TOP_INDEX_CAPACITY", "100"))
 
 # Initialize S3 Client for R2
 s3_client = boto3.client(
@@ -38,20 +46,91 @@ def get_top_items(data, item_type, count=10):
     if data and "packages" in data:
         items = data["packages"]
         sorted_items = sorted(items, key=lambda item: item["lastModified"], reverse=True)
-        return [
-            {
-                "congress": item["congress"],
-                "number": extract_number_from_packageId(item["packageId"]),
-                "title": item["title"],
-                "type": item["docClass"],
-                "updateDate": format_date(item["lastModified"]), # Format the date
-                "url": item["packageLink"],
-            }
-            for item in sorted_items[:count]
-        ]
+        return [format_item(item) for item in sorted_items[:count]]
     return []
 
 
+def format_item(item):
+    """Converts a catalog package into a data.json entry."""
+    return {
+        "congress": item["congress"],
+        "number": extract_number_from_packageId(item["packageId"]),
+        "title": item["title"],
+        "type": item["docClass"],
+        "updateDate": format_date(item["lastModified"]), # Format the date
+        "url": item["packageLink"],
+    }
+
+
+def load_top_index(key):
+    """Loads a maintained top-N index from R2, or None if it has not been built yet."""
+    try:
+        response = s3_client.get_object(Bucket=R2_BUCKET_NAME, Key=key)
+        return TopIndex.from_dict(json.loads(response["Body"].read()))
+    except s3_client.exceptions.NoSuchKey:
+        return None
+
+
+def bootstrap_top_index(catalog_key, prefix):
+    """Builds a top-N index from every package in the catalog, so each docClass list is complete.
+
+    A partitioned catalog is scanned one shard at a time rather than loaded whole.
+    """
+    if os.getenv("CATALOG_LAYOUT") == "partitioned":
+        packages = catalog.iter_packages(prefix)
+    else:
+        packages = (load_data_from_r2(catalog_key) or {}).get("packages", [])
+    return TopIndex.build(packages, TOP_INDEX_CAPACITY)
+
+
+def build_top_index(index_key, catalog_key, prefix):
+    """Builds a top-N index from the catalog and saves it; only needed once per catalog."""
+    index = bootstrap_top_index(catalog_key, prefix)
+    update_data_in_r2(index.to_dict(), index_key)
+    return index
+
+
+def update_top_index(index_key, changes, catalog_key, prefix):
+    """Applies the packages changed by an update run to a top-N index in O(changes log N).
+
+    The first run has no index yet, so it is built from the catalog before the delta is applied.
+    """
+    index = load_top_index(index_key) or build_top_index(index_key, catalog_key, prefix)
+    index.update(changes)
+    update_data_in_r2(index.to_dict(), index_key)
+    return index
+
+
+def top_lists(index, count=TOP_COUNT, by_class=False):
+    """Returns the overall top list and, optionally, one list per docClass."""
+    lists = {"top": [format_item(item) for item in index.top(count)]}
+    if by_class:
+        lists["by_class"] = {doc_class: [format_item(item) for item in index.top(count, doc_class)]
+                             for doc_class in index.doc_classes()}
+    return lists
+
+
+def refresh_data_json(bills_index=None, laws_index=None):
+    """Regenerates data.json, loading (or bootstrapping) any index that was not passed in."""
+    bills_index = (bills_index or load_top_index(R2_TOP_BILLS_KEY)
+                   or build_top_index(R2_TOP_BILLS_KEY, R2_BILLS_KEY, catalog.R2_BILLS_PREFIX))
+    laws_index = (laws_index or load_top_index(R2_TOP_LAWS_KEY)
+                  or build_top_index(R2_TOP_LAWS_KEY, R2_LAWS_KEY, catalog.R2_LAWS_PREFIX))
+    write_data_json(bills_index, laws_index, by_class=os.getenv("TOP_BY_CLASS") == "1")
+
+
+def write_data_json(bills_index, laws_index, count=TOP_COUNT, by_class=False):
+    """Regenerates data.json from the top-N indexes without touching the catalogs."""
+    bills = top_lists(bills_index, count, by_class)
+    laws = top_lists(laws_index, count, by_class)
+
+    data_to_save = {"top_bills": bills["top"], "top_laws": laws["top"]}
+    if by_class:
+        data_to_save["top_bills_by_class"] = bills["by_class"]
+        data_to_save["top_laws_by_class"] = laws["by_class"]
+    update_data_in_r2(data_to_save, R2_DATA_KEY)
+
+
 def format_date(date_string):
     """Converts the date string from YYYY-MM-DD'T'hh:mm:ssZ to YYYY-MM-DD."""
     try:
@@ -81,10 +160,23 @@ def update_data_in_r2(data, key):
         print(f"Error updating/creating data in R2 (key: {key}): {e}")
 
 
+def load_newest_from_partitions(prefix, count=10):
+    """Loads only the catalog shards needed for the newest 'count' packages."""
+    return {"packages": catalog.load_newest(prefix, count)}
+
+
 def main():
     """Loads bills and laws data, extracts top items, and updates data.json in R2."""
-    bills_data = load_data_from_r2(R2_BILLS_KEY)
-    laws_data = load_data_from_r2(R2_LAWS_KEY)
+    if os.getenv("DATA_SOURCE", "index") == "index":
+        refresh_data_json()
+        return
+
+    if os.getenv("CATALOG_LAYOUT") == "partitioned":
+        bills_data = load_newest_from_partitions(catalog.R2_BILLS_PREFIX)
+        laws_data = load_newest_from_partitions(catalog.R2_LAWS_PREFIX)
+    else:
+        bills_data = load_data_from_r2(R2_BILLS_KEY)
+        laws_data = load_data_from_r2(R2_LAWS_KEY)
 
     top_bills = get_top_items(bills_data, "bill")
     top_laws = get_top_items(laws_data, "law")
@@ -1,8 +1,16 @@
+import argparse
 import requests
 import json
 import time
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from tqdm import tqdm
+import boto3
+
+from src.r2 import MultipartWriter
+from src.ratelimit import TokenBucket, retry_after_seconds
 
 base_url = "https://api.govinfo.gov/collections/BILLS/2018-01-28T20%3A18%3A10Z"
 params = {
@@ -12,83 +20,363 @@ params = {
     "api_key": "He7pQCphxtdIziKbNImyaDlelS2W5oXwgb8qKtg4"
 }
 
+collection_url = "https://api.govinfo.gov/collections/BILLS"
+
+# Cloudflare R2 (AWS S3 compatible) configuration, used for r2:// outputs
+R2_BUCKET = "elevenlabs-hackathon"
+
+s3 = boto3.client(
+    's3',
+    aws_access_key_id=os.getenv("R2_ACCESS_KEY"),
+    aws_secret_access_key=os.getenv("R2_SECRET_KEY"),
+    endpoint_url=os.getenv("R2_ENDPOINT")
+)
+
 data_dir = "chunks"
-os.makedirs(data_dir, exist_ok=True)
-
-existing_chunks = [f for f in os.listdir(data_dir) if f.endswith(".json")]
-if existing_chunks:
-    last_chunk_number = max([int(f.split("_")[1].split(".")[0]) for f in existing_chunks])
-    chunk_counter = last_chunk_number + 1
-    url = None  
-else:
-    chunk_counter = 0
-    response = requests.get(base_url, params=params)
-    response.raise_for_status()
-    data = response.json()
-
-    total_bills = data.get("count")
-    url = data.get("nextPage")
-
-    if url and "api_key" not in url:
-        url += f"&api_key={params['api_key']}"
-
-    # Save the first page data immediately
-    chunk_filename = os.path.join(data_dir, f"chunk_{chunk_counter}.json")
-    with open(chunk_filename, "w") as f:
-        json.dump(data, f, indent=4)
-    chunk_counter += 1
+backfill_dir = os.path.join(data_dir, "backfill")
+plan_file = os.path.join(backfill_dir, "plan.json")
 
-    if total_bills:
-        pbar = tqdm(total=total_bills, desc="Downloading bills", unit="bill")
-        pbar.update(len(data.get("packages", [])))
-    else:
-        pbar = tqdm(desc="Downloading bills", unit="bill")
+DEFAULT_BACKFILL_START = "2018-01-28T20:18:10Z"
+DEFAULT_BACKFILL_PARTITIONS = 16
 
-while url:
-    try:
-        response = requests.get(url)
+# api.data.gov allows 1000 requests per hour per key by default.
+GOVINFO_REQUESTS_PER_SECOND = float(os.getenv("GOVINFO_REQUESTS_PER_SECOND", str(1000 / 3600)))
 
-        if response.status_code == 429:
-            retry_after = int(response.headers.get("Retry-After", 60))
-            print(f"Rate limited! Retrying after {retry_after} seconds...")
-            time.sleep(retry_after)
-            continue
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
-        response.raise_for_status()
 
+def download_chunks():
+    """Walks the offsetMark cursor one page at a time, saving each page as a chunk file."""
+    os.makedirs(data_dir, exist_ok=True)
+
+    total_bills = None
+    existing_chunks = [f for f in os.listdir(data_dir) if f.startswith("chunk_") and f.endswith(".json")]
+    if existing_chunks:
+        last_chunk_number = max([int(f.split("_")[1].split(".")[0]) for f in existing_chunks])
+        chunk_counter = last_chunk_number + 1
+        url = None
+    else:
+        chunk_counter = 0
+        response = requests.get(base_url, params=params)
+        response.raise_for_status()
         data = response.json()
 
+        total_bills = data.get("count")
+        url = data.get("nextPage")
+
+        if url and "api_key" not in url:
+            url += f"&api_key={params['api_key']}"
+
+        # Save the first page data immediately
         chunk_filename = os.path.join(data_dir, f"chunk_{chunk_counter}.json")
         with open(chunk_filename, "w") as f:
             json.dump(data, f, indent=4)
-
         chunk_counter += 1
 
         if total_bills:
+            pbar = tqdm(total=total_bills, desc="Downloading bills", unit="bill")
             pbar.update(len(data.get("packages", [])))
+        else:
+            pbar = tqdm(desc="Downloading bills", unit="bill")
+
+    while url:
+        try:
+            response = requests.get(url)
+
+            if response.status_code == 429:
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                print(f"Rate limited! Retrying after {retry_after} seconds...")
+                time.sleep(retry_after)
+                continue
+
+            response.raise_for_status()
+
+            data = response.json()
+
+            chunk_filename = os.path.join(data_dir, f"chunk_{chunk_counter}.json")
+            with open(chunk_filename, "w") as f:
+                json.dump(data, f, indent=4)
+
+            chunk_counter += 1
+
+            if total_bills:
+                pbar.update(len(data.get("packages", [])))
+
+            url = data.get("nextPage")
+            if url and "api_key" not in url:
+                url += f"&api_key={params['api_key']}"
+
+        except requests.exceptions.RequestException as e:
+            print(f"Error during request: {e}")
+            break
+        except (KeyError, json.JSONDecodeError) as e:
+            print(f"Error parsing JSON response: {e}")
+            break
+
+    if total_bills:
+        pbar.close()
+
+
+def split_date_range(start, end, partitions):
+    """Splits [start, end) into `partitions` contiguous date ranges."""
+    step = (end - start) / partitions
+    bounds = [start + step * i for i in range(partitions)] + [end]
+    return [(bounds[i], bounds[i + 1]) for i in range(partitions)]
+
+
+def fetch_page(session, limiter, url, query, retries=5):
+    """Fetches one page under the shared rate limit, honouring Retry-After for every worker."""
+    backoff_time = 2
+    for attempt in range(retries):
+        limiter.acquire()
+        try:
+            response = session.get(url, params=query)
+        except requests.exceptions.ConnectionError as e:
+            print(f"Connection error on attempt {attempt + 1}: {e}. Retrying in {backoff_time} seconds...")
+            time.sleep(backoff_time)
+            backoff_time *= 2
+            continue
+
+        if response.status_code == 429:
+            retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            print(f"Rate limited! Pausing all partitions for {retry_after} seconds...")
+            limiter.pause(retry_after)
+            continue
+        if response.status_code >= 500:
+            print(f"Server error ({response.status_code}) on attempt {attempt + 1}. Retrying in {backoff_time} seconds...")
+            time.sleep(backoff_time)
+            backoff_time *= 2
+            continue
+
+        response.raise_for_status()
+        return response.json()
+
+    raise requests.exceptions.RetryError(f"Failed to fetch {url} after {retries} attempts")
+
+
+def download_partition(number, start, end, limiter, pbar):
+    """Downloads one date-range partition, checkpointing after every page so it can resume."""
+    partition_dir = os.path.join(backfill_dir, f"partition_{number:03d}")
+    os.makedirs(partition_dir, exist_ok=True)
+    state_file = os.path.join(partition_dir, "state.json")
+
+    state = {
+        "start": start.strftime(TIMESTAMP_FORMAT),
+        "end": end.strftime(TIMESTAMP_FORMAT),
+        "pages": 0,
+        "nextPage": None,
+        "done": False,
+    }
+    if os.path.exists(state_file):
+        with open(state_file) as f:
+            saved = json.load(f)
+        if (saved["start"], saved["end"]) == (state["start"], state["end"]):
+            state = saved
+    if not state["pages"]:
+        # A new or changed range; pages of an earlier range must not be merged.
+        for f in os.listdir(partition_dir):
+            if f.startswith("page_"):
+                os.remove(os.path.join(partition_dir, f))
+    if state["done"]:
+        return state
+
+    session = requests.Session()
+    if state["nextPage"]:
+        url, query = state["nextPage"], {"api_key": params["api_key"]}
+    else:
+        url = f"{collection_url}/{state['start']}/{state['end']}"
+        query = {key: value for key, value in params.items() if key != "fromDateTime"}
+
+    while url:
+        data = fetch_page(session, limiter, url, query)
+
+        with open(os.path.join(partition_dir, f"page_{state['pages']:05d}.json"), "w") as f:
+            json.dump(data, f)
+        pbar.update(len(data.get("packages", [])))
 
         url = data.get("nextPage")
-        if url and "api_key" not in url:
-            url += f"&api_key={params['api_key']}"
+        query = {"api_key": params["api_key"]}
+        state["pages"] += 1
+        state["nextPage"] = url
+        state["done"] = not url
+        with open(state_file, "w") as f:
+            json.dump(state, f)
+
+    return state
+
+
+def load_plan():
+    """Returns the saved backfill plan ({"start", "end", "partitions"}), or None."""
+    if not os.path.exists(plan_file):
+        return None
+    with open(plan_file) as f:
+        return json.load(f)
+
+
+def resolve_plan(start=None, end=None, partitions=None):
+    """Fills in options not given on the command line from the saved plan, so a rerun resumes it.
+
+    Without a saved plan the defaults apply, with "now" fixed to the time of the first run.
+    """
+    plan = load_plan() or {}
+    start = start or plan.get("start") or DEFAULT_BACKFILL_START
+    end = end or plan.get("end") or "now"
+    partitions = partitions or plan.get("partitions") or DEFAULT_BACKFILL_PARTITIONS
+    return parse_timestamp(start), parse_timestamp(end), partitions
+
+
+def save_plan(start, end, partitions):
+    """Records the plan and removes partitions of an earlier, larger plan."""
+    os.makedirs(backfill_dir, exist_ok=True)
+    for partition in os.listdir(backfill_dir):
+        if partition.startswith("partition_") and int(partition[len("partition_"):]) >= partitions:
+            shutil.rmtree(os.path.join(backfill_dir, partition))
+    with open(plan_file, "w") as f:
+        json.dump({"start": start.strftime(TIMESTAMP_FORMAT), "end": end.strftime(TIMESTAMP_FORMAT),
+                   "partitions": partitions}, f)
+
+
+def backfill(start, end, partitions=DEFAULT_BACKFILL_PARTITIONS, workers=4,
+             requests_per_second=GOVINFO_REQUESTS_PER_SECOND):
+    """Downloads a date span as concurrent date-range partitions under one shared rate limit."""
+    save_plan(start, end, partitions)
+    limiter = TokenBucket(requests_per_second, capacity=workers)
+    ranges = split_date_range(start, end, partitions)
+
+    with tqdm(desc="Backfilling bills", unit="bill") as pbar, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(download_partition, number, a, b, limiter, pbar)
+                   for number, (a, b) in enumerate(ranges)]
+        states = []
+        for future in futures:
+            try:
+                states.append(future.result())
+            except requests.exceptions.RequestException as e:
+                print(f"Partition failed, rerun to resume it: {e}")
+
+    print(f"{sum(state['done'] for state in states)}/{partitions} partitions complete")
+    return len(states) == partitions and all(state["done"] for state in states)
+
+
+def chunk_files():
+    """Returns the sequential chunk files in download order."""
+    chunks = [f for f in os.listdir(data_dir) if f.startswith("chunk_") and f.endswith(".json")]
+    return [os.path.join(data_dir, f) for f in sorted(chunks, key=lambda f: int(f[6:-5]))]
+
+
+def backfill_files():
+    """Returns the saved pages of every backfill partition."""
+    files = []
+    for partition in sorted(p for p in os.listdir(backfill_dir) if p.startswith("partition_")):
+        partition_dir = os.path.join(backfill_dir, partition)
+        files.extend(os.path.join(partition_dir, f)
+                     for f in sorted(os.listdir(partition_dir)) if f.startswith("page_"))
+    return files
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error during request: {e}")
-        break
-    except (KeyError, json.JSONDecodeError) as e:
-        print(f"Error parsing JSON response: {e}")
-        break
 
-if total_bills:
-    pbar.close()
+def iter_packages(files):
+    """Yields packages one page file at a time, so only a single page is held in memory."""
+    for path in files:
+        with open(path) as f:
+            yield from json.load(f).get("packages", [])
 
-all_packages = []
-for chunk_file in os.listdir(data_dir):
-    if chunk_file.endswith(".json"):
-        with open(os.path.join(data_dir, chunk_file), "r") as f:
-            chunk_data = json.load(f)
-            all_packages.extend(chunk_data.get("packages", []))
 
-with open("bills.json", "w") as f:
-    json.dump({"packages": all_packages}, f, indent=4)
+def newest_versions(files):
+    """Maps each packageId to its newest lastModified across all pages."""
+    newest = {}
+    for package in iter_packages(files):
+        if package["lastModified"] > newest.get(package["packageId"], ""):
+            newest[package["packageId"]] = package["lastModified"]
+    return newest
+
+
+def open_output(output):
+    """Opens a local file, or an R2 multipart upload for outputs of the form r2://<key>."""
+    if output.startswith("r2://"):
+        return MultipartWriter(s3, R2_BUCKET, output[len("r2://"):])
+    return open(output, "w")
+
+
+def write_packages(packages, output, fmt="json"):
+    """Streams packages to `output` as compact JSON ({"packages": [...]}) or NDJSON."""
+    count = 0
+    with open_output(output) as out:
+        if fmt == "json":
+            out.write('{"packages":[')
+        for package in packages:
+            line = json.dumps(package, separators=(",", ":"))
+            if fmt == "json":
+                out.write(f",{line}" if count else line)
+            else:
+                out.write(f"{line}\n")
+            count += 1
+        if fmt == "json":
+            out.write("]}")
+    return count
+
+
+def merge_backfill(output="bills.json", fmt="json"):
+    """Merges the backfill partitions, keeping the newest copy of each packageId."""
+    files = backfill_files()
+
+    # Overlapping partitions can return a package twice; only packageIds and
+    # timestamps are held in memory to pick the copy to keep.
+    newest = newest_versions(files)
+
+    def packages():
+        for package in iter_packages(files):
+            # Only the newest copy matches; drop its entry so an equal duplicate is skipped.
+            if newest.get(package["packageId"]) == package["lastModified"]:
+                del newest[package["packageId"]]
+                yield package
+
+    count = write_packages(packages(), output, fmt)
+    print(f"All data successfully saved to {output} ({count} packages)")
+
+
+def merge_chunks(output="bills.json", fmt="json"):
+    count = write_packages(iter_packages(chunk_files()), output, fmt)
+    print(f"All data successfully saved to {output} ({count} packages)")
+
+
+def parse_timestamp(value):
+    if value == "now":
+        return datetime.now(timezone.utc).replace(microsecond=0)
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the govinfo BILLS collection.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("sequential", help="walk the offsetMark cursor one page at a time (default)")
+
+    backfill_parser = subparsers.add_parser("backfill", help="download date-range partitions concurrently")
+    # Options left out are taken from the saved plan, so rerunning the same command resumes it.
+    backfill_parser.add_argument("--from", dest="start", help=f"default {DEFAULT_BACKFILL_START}")
+    backfill_parser.add_argument("--to", dest="end", help="default now, fixed when the plan is first saved")
+    backfill_parser.add_argument("--partitions", type=int, help=f"default {DEFAULT_BACKFILL_PARTITIONS}")
+    backfill_parser.add_argument("--workers", type=int, default=4)
+    backfill_parser.add_argument("--rps", type=float, default=GOVINFO_REQUESTS_PER_SECOND,
+                                 help="shared govinfo request budget per second")
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("--output", default="bills.json",
+                               help="output file, or r2://<key> to upload straight to R2")
+        subparser.add_argument("--format", choices=["json", "ndjson"], default="json")
+
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        start, end, partitions = resolve_plan(args.start, args.end, args.partitions)
+        if backfill(start, end, partitions, args.workers, args.rps):
+            merge_backfill(args.output, args.format)
+    elif args.command == "sequential":
+        download_chunks()
+        merge_chunks(args.output, args.format)
+    else:
+        download_chunks()
+        merge_chunks()
+
 
-print("All data successfully saved to laws.json")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
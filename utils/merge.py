@@ -0,0 +1,53 @@
+import heapq
+from itertools import pairwise
+from operator import itemgetter
+
+by_last_modified = itemgetter("lastModified")
+
+
+def index_items(items, key_field="packageId"):
+    """Builds a packageId -> package index over the existing catalog."""
+    return {item[key_field]: item for item in items}
+
+
+def update_items(index, changes, new_items, key_field="packageId"):
+    """Records new and updated packages from one API page in `changes`.
+
+    `index` holds the existing catalog and `changes` the packages collected
+    from earlier pages, so each lookup is O(1). Processing stops at a known
+    package that needs no update if nothing before it on the page changed.
+    Returns (updated, stop_early).
+    """
+    updated = False  # Flag to indicate if any updates were made
+
+    for new_item in new_items:
+        key = new_item[key_field]
+        current = changes.get(key) or index.get(key)
+        if current is None:
+            changes[key] = new_item
+            updated = True
+            print(f"Added new item: {key}")
+        elif new_item["lastModified"] > current["lastModified"]:
+            changes[key] = new_item
+            updated = True
+            print(f"Updated item: {key}")
+        elif not updated:
+            # If a matching item is found and no updates were needed, stop further processing
+            print("Match found with no updates needed. Stopping early to avoid unnecessary downloads.")
+            return updated, True
+
+    return updated, False
+
+
+def merge_changes(existing_items, changes, key_field="packageId"):
+    """Merges changed packages into the existing catalog, newest lastModified first.
+
+    The existing catalog is kept sorted, so only the k changed packages are
+    sorted and the result is a single O(n + k log k) merge.
+    """
+    if any(a["lastModified"] < b["lastModified"] for a, b in pairwise(existing_items)):
+        existing_items = sorted(existing_items, key=by_last_modified, reverse=True)
+
+    changed = sorted(changes.values(), key=by_last_modified, reverse=True)
+    unchanged = (item for item in existing_items if item[key_field] not in changes)
+    return list(heapq.merge(changed, unchanged, key=by_last_modified, reverse=True))
@@ -0,0 +1,115 @@
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+from src import limits
+from src.info import generate_uid_from_url, get_bill_infos_from_kv, process_bill_url
+from utils.data import R2_DATA_KEY, load_data_from_r2
+
+
+def trending_urls(data):
+    """Returns the unique package URLs listed in data.json, in the order they appear."""
+    urls = []
+    for name, value in data.items():
+        lists = value.values() if name.endswith("_by_class") else [value]
+        for items in lists:
+            urls.extend(item["url"] for item in items)
+    return list(dict.fromkeys(urls))
+
+
+def load_trending(source):
+    """Loads data.json from a local path, or from R2 when `source` is None."""
+    if source is None:
+        return load_data_from_r2(R2_DATA_KEY) or {}
+    with open(source) as f:
+        return json.load(f)
+
+
+def warm(url):
+    """Runs the cold path for one URL and returns (status, seconds, error)."""
+    start = time.perf_counter()
+    try:
+        result = process_bill_url(url)
+    except Exception as e:
+        result = {"error": str(e)}
+    elapsed = time.perf_counter() - start
+    if "error" in result:
+        return "failed", elapsed, result["error"]
+    return "generated", elapsed, None
+
+
+def prewarm(urls, workers=4, dry_run=False):
+    """Generates bill info for every URL not in KV yet, at most `workers` at a time."""
+    cached = get_bill_infos_from_kv([generate_uid_from_url(url) for url in urls])
+    report = {"generated": [], "skipped": [], "failed": []}
+
+    misses = []
+    for url in urls:
+        if generate_uid_from_url(url) in cached:
+            report["skipped"].append({"url": url})
+        else:
+            misses.append(url)
+
+    if dry_run:
+        report["pending"] = [{"url": url} for url in misses]
+        return report
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prewarm") as executor, \
+            tqdm(total=len(misses), desc="Prewarming bills", unit="bill") as pbar:
+        futures = {executor.submit(warm, url): url for url in misses}
+        for future in as_completed(futures):
+            status, elapsed, error = future.result()
+            entry = {"url": futures[future], "seconds": round(elapsed, 2)}
+            if error:
+                entry["error"] = error
+            report[status].append(entry)
+            pbar.update(1)
+
+    return report
+
+
+def parse_budget(value):
+    """Parses a provider budget of the form name=rpm or name=rpm:max_in_flight."""
+    name, _, budget = value.partition("=")
+    if name not in limits.PROVIDERS or not budget:
+        raise argparse.ArgumentTypeError(f"expected <provider>=<rpm>[:<max_in_flight>], provider one of {', '.join(limits.PROVIDERS)}")
+    rpm, _, max_in_flight = budget.partition(":")
+    overrides = {"rpm": float(rpm)}
+    if max_in_flight:
+        overrides["max_in_flight"] = int(max_in_flight)
+    return name, overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate bill info for the bills listed in data.json.")
+    parser.add_argument("--source", help="local data.json to read instead of the one in R2")
+    parser.add_argument("--workers", type=int, default=4, help="bills processed at the same time")
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[],
+                        help="per-provider limit for this run, e.g. gemini=15 or elevenlabs=10:2 (rpm[:max_in_flight])")
+    parser.add_argument("--dry-run", action="store_true", help="only report which bills are not cached")
+    parser.add_argument("--report", help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    for name, overrides in args.budget:
+        limits.configure(name, **overrides)
+
+    urls = trending_urls(load_trending(args.source))
+    report = prewarm(urls, args.workers, args.dry_run)
+
+    summary = ", ".join(f"{len(entries)} {status}" for status, entries in report.items())
+    print(f"Prewarmed {len(urls)} bills: {summary}")
+    for entry in report["failed"]:
+        print(f"Failed {entry['url']}: {entry['error']}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=4)
+
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
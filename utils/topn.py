@@ -0,0 +1,85 @@
+import heapq
+
+ALL = "all"
+
+
+class TopIndex:
+    """Keeps the `capacity` most recently modified packages, overall and per docClass.
+
+    Each list is a min-heap on lastModified, so applying a delta of k changed
+    packages costs O(k log capacity). Replaced entries are left in the heap and
+    skipped lazily; the heap is compacted when it grows past twice its size.
+    """
+
+    def __init__(self, capacity=100, key_field="packageId"):
+        self.capacity = capacity
+        self.key_field = key_field
+        self._lists = {}
+
+    @classmethod
+    def build(cls, items, capacity=100, key_field="packageId"):
+        """Bootstraps an index from a full catalog."""
+        index = cls(capacity, key_field)
+        index.update(items)
+        return index
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(data["capacity"], data.get("key_field", "packageId"))
+        for items in data["lists"].values():
+            index.update(items)
+        return index
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "key_field": self.key_field,
+            "lists": {name: self.top(self.capacity, None if name == ALL else name) for name in self._lists},
+        }
+
+    def update(self, items):
+        """Applies new or modified packages to the overall and docClass lists."""
+        for item in items:
+            self._push(ALL, item)
+            if doc_class := item.get("docClass"):
+                self._push(doc_class, item)
+
+    def top(self, count=10, doc_class=None):
+        """Returns up to `count` packages, newest lastModified first."""
+        entries = self._lists.get(doc_class or ALL, ({}, []))[0]
+        return heapq.nlargest(min(count, self.capacity), entries.values(), key=lambda item: item["lastModified"])
+
+    def doc_classes(self):
+        return sorted(name for name in self._lists if name != ALL)
+
+    def _push(self, name, item):
+        entries, heap = self._lists.setdefault(name, ({}, []))
+        key = item[self.key_field]
+        last_modified = item["lastModified"]
+
+        current = entries.get(key)
+        if current is not None and current["lastModified"] >= last_modified:
+            return
+
+        if current is None and len(entries) >= self.capacity:
+            self._drop_stale(entries, heap)
+            if heap[0][0] >= last_modified:
+                return
+            _, evicted = heapq.heappop(heap)
+            del entries[evicted]
+
+        entries[key] = item
+        heapq.heappush(heap, (last_modified, key))
+
+        if len(heap) > 2 * self.capacity:
+            heap[:] = [(entry["lastModified"], key) for key, entry in entries.items()]
+            heapq.heapify(heap)
+
+    def _drop_stale(self, entries, heap):
+        """Pops heap entries that no longer match the current version of their package."""
+        while heap:
+            last_modified, key = heap[0]
+            entry = entries.get(key)
+            if entry is not None and entry["lastModified"] == last_modified:
+                return
+            heapq.heappop(heap)
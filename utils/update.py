@@ -9,6 +9,11 @@ import boto3
 from botocore.exceptions import BotoCoreError, NoCredentialsError
 import random
 
+from src.ratelimit import retry_after_seconds
+from utils import catalog
+from utils.data import R2_TOP_BILLS_KEY, refresh_data_json, update_top_index
+from utils.merge import index_items, merge_changes, update_items
+
 # Cloudflare R2 (AWS S3 compatible) configuration
 R2_ACCESS_KEY = os.getenv("R2_ACCESS_KEY")
 R2_SECRET_KEY = os.getenv("R2_SECRET_KEY")
@@ -69,7 +74,7 @@ def fetch_data_from_api(url, params, retries=3):
             response.raise_for_status()
 
             if response.status_code == 429:
-                retry_after = int(response.headers.get("Retry-After", 60))
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
                 print(f"Rate limited! Retrying after {retry_after} seconds...")
                 time.sleep(retry_after)
                 continue
@@ -99,59 +104,24 @@ def fetch_data_from_api(url, params, retries=3):
     print(f"Failed to fetch data after {retries} attempts.")
     return None
 
-def update_items(existing_items, new_items, key_field="packageId"):
-    """Update the existing items with new data and stop if a match without updates is found."""
-    updated = False  # Flag to indicate if any updates were made
-    stop_early = False  # Flag to indicate if a match with no updates was found
-
-    for new_item in new_items:
-        found_match = False
-        for i, existing_item in enumerate(existing_items):
-            if new_item[key_field] == existing_item[key_field]:
-                if new_item["lastModified"] > existing_item["lastModified"]:
-                    existing_items[i] = new_item  # Update existing item
-                    print(f"Updated item: {new_item[key_field]}")
-                    updated = True 
-                found_match = True
-                break  # Exit inner loop if a match is found
-        if not found_match:
-            existing_items.insert(0, new_item)  # Add new item at the beginning
-            updated = True
-            print(f"Added new item: {new_item[key_field]}")
-        elif found_match and not updated:
-            # If a matching item is found and no updates were needed, stop further processing
-            print("Match found with no updates needed. Stopping early to avoid unnecessary downloads.")
-            stop_early = True
-            break # Exit outer loop if no update needed
-
-    return updated, stop_early 
-
-def sort_items_by_date(items):
-    """Sort items by lastModified in descending order."""
-    return sorted(items, key=lambda item: item['lastModified'], reverse=True)
+def parse_last_modified(value):
+    """Parses a govinfo lastModified timestamp, falling back to the default start date."""
+    if value:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return datetime(2018, 1, 28, 20, 18, 10)  # Default start date
 
-
-def fetch_and_update_data(base_url, file_key):
-    """Fetches data from the API and updates the existing data in Cloudflare R2."""
-
-    # Load existing data
-    all_items = load_existing_data(file_key)
-
-    # Get the last modified date from the existing data (or a default date)
-    if all_items:
-        last_modified_date = datetime.fromisoformat(all_items[0]["lastModified"].replace("Z", "+00:00"))
-    else:
-        last_modified_date = datetime(2018, 1, 28, 20, 18, 10)  # Default start date
+def collect_changes(base_url, index, changes, last_modified_date):
+    """Pages through packages modified after last_modified_date, recording them in `changes`."""
 
     # Set fromDateTime parameter based on the last modified date
-    params["fromDateTime"] = (last_modified_date + timedelta(seconds=1)).isoformat() + "Z"
+    query = dict(params, fromDateTime=(last_modified_date + timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ"))
 
     url = base_url
     updated = False
 
     with tqdm(desc="Updating packages", unit="package") as pbar:
         while url:
-            data = fetch_data_from_api(url, params)
+            data = fetch_data_from_api(url, query)
             if data is None:
                 break  # Exit if the request failed
 
@@ -161,7 +131,8 @@ def fetch_and_update_data(base_url, file_key):
                 break
 
             # Check for matching items and update/add as needed
-            updated, stop_early = update_items(all_items, new_items)
+            page_updated, stop_early = update_items(index, changes, new_items)
+            updated = updated or page_updated
 
             # Stop fetching if a match with no update is found
             if stop_early:
@@ -170,18 +141,36 @@ def fetch_and_update_data(base_url, file_key):
             # Update progress bar
             pbar.update(len(new_items))
 
-            # Get the next page URL
-            next_page_url = data.get("nextPage")
-            if next_page_url:
-                # Merge nextPage URL with api_key to avoid duplicates
-                url += f"&{params['api_key']}"
-            else:
-                url = None
+            # nextPage carries the query and offsetMark; only the api_key has to be added
+            url = data.get("nextPage")
+            query = {"api_key": params["api_key"]}
 
             time.sleep(1)
 
-    # Sort the items by lastModified in descending order
-    all_items = sort_items_by_date(all_items)
+    return updated
+
+def update_catalog(base_url, file_key):
+    """Loads a catalog once and merges in the packages changed since its newest entry.
+
+    Returns the merged catalog (newest first), the changed packages and whether anything changed.
+    """
+
+    # Load existing data
+    all_items = load_existing_data(file_key)
+
+    # Get the last modified date from the existing data (or a default date)
+    last_modified_date = parse_last_modified(max((item["lastModified"] for item in all_items), default=None))
+
+    changes = {}
+    updated = collect_changes(base_url, index_items(all_items), changes, last_modified_date)
+
+    # Merge the changes into the catalog, keeping it sorted by lastModified
+    return merge_changes(all_items, changes), changes, updated
+
+def fetch_and_update_data(base_url, file_key):
+    """Fetches data from the API and updates the existing data in Cloudflare R2."""
+
+    all_items, changes, updated = update_catalog(base_url, file_key)
 
     # Save the updated and sorted data
     if updated:
@@ -192,5 +181,40 @@ def fetch_and_update_data(base_url, file_key):
     else:
         print("No package data available.")
 
-# Run the update function for packages
-fetch_and_update_data(base_url, R2_PACKAGES_FILE_KEY)
\ No newline at end of file
+    return changes
+
+def fetch_and_update_partitioned(base_url, prefix, file_key=None):
+    """Fetches new packages and rewrites only the catalog shards they belong to.
+
+    Without a manifest, the monolithic catalog at `file_key` is converted first,
+    so only packages newer than it are paged from the API.
+    """
+
+    manifest = catalog.load_manifest(prefix)
+    if not manifest["shards"] and file_key and (items := load_existing_data(file_key)):
+        print(f"Migrating {len(items)} packages from {file_key} to {prefix}")
+        manifest = catalog.migrate_to_partitions(items, prefix)
+    last_modified_date = parse_last_modified(manifest["lastModified"])
+
+    # Everything returned is newer than the manifest, so no existing index is needed.
+    changes = {}
+    if collect_changes(base_url, {}, changes, last_modified_date):
+        manifest = catalog.apply_changes(prefix, manifest, changes)
+
+    print(f"Catalog {prefix}: {manifest['count']} packages in {len(manifest['shards'])} shards, "
+          f"last updated package: {manifest['lastModified']}")
+
+    return changes
+
+if __name__ == "__main__":
+    # Run the update function for packages
+    if os.getenv("CATALOG_LAYOUT") == "partitioned":
+        changes = fetch_and_update_partitioned(base_url, catalog.R2_BILLS_PREFIX, R2_PACKAGES_FILE_KEY)
+    else:
+        changes = fetch_and_update_data(base_url, R2_PACKAGES_FILE_KEY)
+
+    # Keep data.json current from the delta instead of re-reading the catalog
+    if changes:
+        bills_index = update_top_index(R2_TOP_BILLS_KEY, changes.values(),
+                                       R2_PACKAGES_FILE_KEY, catalog.R2_BILLS_PREFIX)
+        refresh_data_json(bills_index=bills_index)